@@ -1,8 +1,11 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from .file_log import FileLog
 
 @dataclass
 class DataModel:
-    file_log: list
+    file_log: FileLog
     decompressed_data: bytes
     error_code: bool = False
     apply_compression: bool = False
+    # Xpress8 chunk directories of compressed files, built on the first ranged read of each file
+    chunk_directories: dict = field(default_factory=dict, repr=False)
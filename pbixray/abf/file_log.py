@@ -0,0 +1,91 @@
+class FileLogEntry:
+    """A storage file of the backup, matched between the backup log and the virtual directory."""
+    __slots__ = ('Path', 'FileName', 'StoragePath', 'Size', 'SizeFromLog', 'm_cbOffsetHeader')
+
+    def __init__(self, Path, FileName, StoragePath, Size, SizeFromLog, m_cbOffsetHeader):
+        self.Path = Path
+        self.FileName = FileName
+        self.StoragePath = StoragePath
+        self.Size = Size
+        self.SizeFromLog = SizeFromLog
+        self.m_cbOffsetHeader = m_cbOffsetHeader
+
+    def __getitem__(self, key):
+        # Dictionary style access, as file log entries used to be dicts
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        if not isinstance(other, FileLogEntry):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"FileLogEntry({self.to_dict()!r})"
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class FileLog:
+    """
+    Storage files of the backup in log order, indexed by `FileName` and `StoragePath`.
+    Lookups by name return the first entry with that name, like a scan of the log would.
+    """
+
+    def __init__(self, entries=()):
+        self._entries = []
+        self._by_file_name = {}
+        self._by_storage_path = {}
+        self._total_size = 0
+        for entry in entries:
+            self.append(entry)
+
+    @classmethod
+    def from_records(cls, records):
+        """Builds a file log from dicts, e.g. a log serialized with `to_records`."""
+        return cls(FileLogEntry(**record) for record in records)
+
+    def to_records(self):
+        return [entry.to_dict() for entry in self._entries]
+
+    def append(self, entry):
+        self._entries.append(entry)
+        self._by_file_name.setdefault(entry.FileName, entry)
+        self._by_storage_path.setdefault(entry.StoragePath, entry)
+        self._total_size += entry.Size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __getitem__(self, index):
+        return self._entries[index]
+
+    def __eq__(self, other):
+        if not isinstance(other, FileLog):
+            return NotImplemented
+        return self._entries == other._entries
+
+    def get(self, file_name, default=None):
+        """Returns the entry of a file by `FileName`."""
+        return self._by_file_name.get(file_name, default)
+
+    def get_by_storage_path(self, storage_path, default=None):
+        return self._by_storage_path.get(storage_path, default)
+
+    def get_many(self, file_names):
+        """Returns the entries of several files by `FileName`, None for files that are not in the log."""
+        by_file_name = self._by_file_name
+        return [by_file_name.get(file_name) for file_name in file_names]
+
+    def sizes(self, file_names, default=0):
+        """Returns the `Size` of several files by `FileName`, `default` for files that are not in the log."""
+        return [default if entry is None else entry.Size for entry in self.get_many(file_names)]
+
+    @property
+    def total_size(self):
+        return self._total_size
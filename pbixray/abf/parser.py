@@ -3,6 +3,7 @@ from .backup_log import BackupLog
 from .backup_log_header import BackupLogHeader
 from .virtual_directory import VirtualDirectory
 from .data_model import DataModel
+from .file_log import FileLog, FileLogEntry
 
 class AbfParser:
     def __init__(self, data_model:DataModel):
@@ -43,7 +44,7 @@ class AbfParser:
     def __match_logs_and_get_attributes(self):
         persist_root = self.__backup_log.FileGroups[1].PersistLocationPath + '\\'
         virtual_directory_files_by_path = {file.Path: file for file in self.__virtual_directory.BackupFiles}
-        matched_data = []
+        file_log = FileLog()
 
         for file_group in self.__backup_log.FileGroups:
             for backup_file in file_group.FileList:
@@ -53,13 +54,13 @@ class AbfParser:
                         path_without_persist_root = backup_file.Path.replace(persist_root, '', 1)
                     else:
                         path_without_persist_root = backup_file.Path
-                    matched_data.append({
-                        'Path': path_without_persist_root,
-                        'FileName': path_without_persist_root.split('\\')[-1],
-                        'StoragePath': backup_file.StoragePath,
-                        'Size': matched_file.Size,
-                        'SizeFromLog': backup_file.Size,
-                        'm_cbOffsetHeader': matched_file.m_cbOffsetHeader
-                    })
+                    file_log.append(FileLogEntry(
+                        Path=path_without_persist_root,
+                        FileName=path_without_persist_root.split('\\')[-1],
+                        StoragePath=backup_file.StoragePath,
+                        Size=matched_file.Size,
+                        SizeFromLog=backup_file.Size,
+                        m_cbOffsetHeader=matched_file.m_cbOffsetHeader
+                    ))
 
-        self.data_model.file_log = matched_data
+        self.data_model.file_log = file_log
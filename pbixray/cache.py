@@ -0,0 +1,139 @@
+import hashlib
+import json
+import mmap
+import os
+import time
+import uuid
+from .abf.data_model import DataModel
+from .abf.file_log import FileLog
+
+
+class DataModelCache:
+    """
+    Content-addressed on-disk cache of decompressed DataModels.
+
+    Entries are keyed by the CRC, size and a BLAKE2 hash of the `DataModel` zip entry.
+    Each entry is the decompressed ABF image (`<key>.abf`), which is memory-mapped on a hit,
+    and the parsed file log (`<key>.json`). The JSON file is written last and marks the entry
+    as complete; its modification time records the last use for LRU eviction.
+    """
+    FORMAT_VERSION = 1
+    DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+    HASH_BLOCK_SIZE = 1024 * 1024
+    # Age after which temporary files are taken to be left behind by a crashed process
+    STALE_TEMPORARY_SECONDS = 24 * 60 * 60
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, zip_ref):
+        """Computes the cache key of the DataModel entry of an open PBIX zip file."""
+        info = zip_ref.getinfo('DataModel')
+        content_hash = hashlib.blake2b(digest_size=16)
+        with zip_ref.open(info) as data_model_file:
+            for block in iter(lambda: data_model_file.read(self.HASH_BLOCK_SIZE), b''):
+                content_hash.update(block)
+        return f"{info.CRC:08x}-{info.file_size:x}-{content_hash.hexdigest()}"
+
+    def image_path(self, key):
+        return os.path.join(self.cache_dir, key + '.abf')
+
+    def log_path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def temporary_image_path(self, key):
+        """A unique path to decompress into before the entry is published with `store`."""
+        return os.path.join(self.cache_dir, f"{key}.{uuid.uuid4().hex}.tmp")
+
+    def load(self, key):
+        """Returns the cached DataModel with a memory-mapped image, or None on a miss."""
+        try:
+            with open(self.log_path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if entry.get('version') != self.FORMAT_VERSION:
+                return None
+            with open(self.image_path(key), 'rb') as f:
+                decompressed_data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        # Record the use for LRU eviction
+        try:
+            os.utime(self.log_path(key))
+        except OSError:
+            pass
+
+        return DataModel(
+            file_log=FileLog.from_records(entry['file_log']),
+            decompressed_data=decompressed_data,
+            error_code=entry['error_code'],
+            apply_compression=entry['apply_compression'],
+        )
+
+    def store(self, key, data_model, temporary_image_path):
+        """Publishes a DataModel decompressed into `temporary_image_path` and evicts old entries."""
+        try:
+            os.replace(temporary_image_path, self.image_path(key))
+            temporary_log_path = self.temporary_image_path(key)
+            with open(temporary_log_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'version': self.FORMAT_VERSION,
+                    'file_log': data_model.file_log.to_records(),
+                    'error_code': data_model.error_code,
+                    'apply_compression': data_model.apply_compression,
+                }, f)
+            os.replace(temporary_log_path, self.log_path(key))
+        except OSError:
+            # Caching is best effort, e.g. a mapped file cannot be renamed on some platforms
+            self.discard(temporary_image_path)
+            return
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        Removes stale temporary files, then least recently used entries until the cache fits in `max_bytes`.
+        """
+        file_names = os.listdir(self.cache_dir)
+        stale_before = time.time() - self.STALE_TEMPORARY_SECONDS
+        for file_name in file_names:
+            if file_name.endswith('.tmp'):
+                path = os.path.join(self.cache_dir, file_name)
+                try:
+                    if os.path.getmtime(path) < stale_before:
+                        self.discard(path)
+                except OSError:
+                    continue
+
+        if self.max_bytes is None:
+            return
+        entries = []
+        total_size = 0
+        for file_name in file_names:
+            if not file_name.endswith('.json'):
+                continue
+            key = file_name[:-len('.json')]
+            try:
+                last_used = os.path.getmtime(self.log_path(key))
+                size = os.path.getsize(self.log_path(key)) + os.path.getsize(self.image_path(key))
+            except OSError:
+                continue
+            entries.append((last_used, key, size))
+            total_size += size
+
+        for _, key, size in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.discard(self.log_path(key))
+            self.discard(self.image_path(key))
+            total_size -= size
+
+    @staticmethod
+    def discard(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,102 @@
+import struct
+from typing import NamedTuple
+
+import numpy as np
+
+# Run of the primary segment, same fields as ColumnDataIdf.SegmentEntry
+SEGMENT_ENTRY_DTYPE = np.dtype([('data_value', '<u4'), ('repeat_value', '<u4')])
+
+
+class IdfSegment(NamedTuple):
+    """A segment of an .idf file as NumPy views over the file buffer (or RangedVectors, from iter_idf)."""
+    primary_segment: np.ndarray
+    sub_segment: np.ndarray
+
+
+def read_idf(buffer):
+    """
+    Reads the segments of an .idf file without copying them: each segment is a u64 entry count and
+    the primary segment runs, followed by a u64 word count and the bitpacked sub segment words.
+    Equivalent to ColumnDataIdf, without a Python object per run or word.
+    """
+    segments = []
+    size = len(buffer)
+    offset = 0
+    while offset < size:
+        primary_segment = _read_vector(buffer, offset, SEGMENT_ENTRY_DTYPE)
+        offset += 8 + primary_segment.nbytes
+        sub_segment = _read_vector(buffer, offset, np.dtype('<u8'))
+        offset += 8 + sub_segment.nbytes
+        segments.append(IdfSegment(primary_segment, sub_segment))
+    return segments
+
+
+def _read_vector(buffer, offset, dtype):
+    """Views a u64 length-prefixed vector of `dtype` elements at `offset`."""
+    if offset + 8 > len(buffer):
+        raise ValueError(f"IDF is truncated: expected a vector size at offset {offset} of {len(buffer)} bytes.")
+    count, = struct.unpack_from('<Q', buffer, offset)
+    if offset + 8 + count * dtype.itemsize > len(buffer):
+        raise ValueError(f"IDF is truncated: vector of {count} elements at offset {offset} exceeds {len(buffer)} bytes.")
+    return np.frombuffer(buffer, dtype=dtype, count=count, offset=offset + 8)
+
+
+class RangedVector:
+    """
+    A u64 length-prefixed vector of an .idf file that is read on demand through `read(offset, length)`.
+    Slicing reads only the requested elements, so files that are not decompressed as a whole
+    can be used where read_idf gives a view.
+    """
+
+    def __init__(self, read, offset, count, dtype):
+        self.read = read
+        self.offset = offset  # of the first element, past the size
+        self.count = count
+        self.dtype = dtype
+
+    @property
+    def nbytes(self):
+        return self.count * self.dtype.itemsize
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            index = key + self.count if key < 0 else key
+            return self[index:index + 1][0]
+        start, stop, step = key.indices(self.count)
+        if step != 1:
+            raise ValueError("RangedVector only supports contiguous slices.")
+        count = max(0, stop - start)
+        size = count * self.dtype.itemsize
+        data = self.read(self.offset + start * self.dtype.itemsize, size) if size else b''
+        if len(data) != size:
+            raise ValueError(f"IDF is truncated: expected {size} bytes at offset {self.offset + start * self.dtype.itemsize}.")
+        return np.frombuffer(data, dtype=self.dtype, count=count)
+
+
+def iter_idf(read):
+    """
+    Yields the segments of an .idf file read through `read(offset, length)` as RangedVectors.
+    Only the sizes of the vectors are read while iterating; a segment's runs and words are read
+    when it is sliced, so segments that are skipped cost two 8-byte reads.
+    """
+    offset = 0
+    while True:
+        header = read(offset, 8)
+        if len(header) == 0:
+            return
+        primary_segment = _ranged_vector(read, offset, header, SEGMENT_ENTRY_DTYPE)
+        offset += 8 + primary_segment.nbytes
+        sub_segment = _ranged_vector(read, offset, read(offset, 8), np.dtype('<u8'))
+        offset += 8 + sub_segment.nbytes
+        yield IdfSegment(primary_segment, sub_segment)
+
+
+def _ranged_vector(read, offset, header, dtype):
+    """Returns the RangedVector whose u64 size `header` was read at `offset`."""
+    if len(header) != 8:
+        raise ValueError(f"IDF is truncated: expected a vector size at offset {offset}.")
+    count, = struct.unpack('<Q', header)
+    return RangedVector(read, offset + 8, count, dtype)
@@ -1,6 +1,8 @@
 # ---------- IMPORTS ----------
 
 from .pbix_unpacker import PbixUnpacker
+from .xpress9_stream import Xpress9Stream
+from .cache import DataModelCache
 from .vertipaq_decoder import VertiPaqDecoder
 from .meta.metadata_handler import MetadataHandler
 from .utils import WINDOWS_EPOCH_START
@@ -11,15 +13,88 @@ import pandas as pd
 # ---------- MAIN CLASS ----------
 
 class PBIXRay:
-    def __init__(self, file_path):
-        unpacker = PbixUnpacker(file_path)
+    def __init__(self, file_path, lazy=False, disk_backed=False, storage_path=None,
+                 cache_dir=None, cache_max_bytes=DataModelCache.DEFAULT_MAX_BYTES, metadata_only=False,
+                 max_workers=1, reuse_storage=False):
+        """
+        Opens a PBIX file.
+
+        Args:
+            file_path (str): Path to the PBIX file.
+            lazy (bool): Read (and decompress Xpress9 chunks of) the DataModel only when it is accessed,
+                instead of decompressing the whole model up front. Saves time and memory for multi-threaded
+                Xpress9 and uncompressed backups only: a single-threaded Xpress9 backup is a single session
+                that has to be decompressed completely to read its virtual directory.
+            disk_backed (bool): Write the decompressed DataModel to a temporary file and memory-map it
+                instead of keeping it in process memory.
+            storage_path (str, optional): File to write the decompressed DataModel to. Implies disk_backed;
+                other processes can map the same file and share it through the page cache. The image is
+                written to a new file that replaces storage_path once complete, so models that map an
+                earlier image keep reading it.
+            cache_dir (str, optional): Directory caching decompressed DataModels by content. Reopening an
+                unchanged file memory-maps the cached image and skips decompression and ABF parsing.
+            cache_max_bytes (int, optional): Size limit of the cache directory; least recently used entries
+                are evicted beyond it. None disables eviction.
+            metadata_only (bool): Open for metadata access. Implies lazy (unless the model is disk backed or
+                cached), so only the ranges holding the backup log, the virtual directory and metadata.sqlitedb
+                are read up front; column data is read on the first get_table. Xpress9 sessions are decoded up
+                to the last of these ranges, which for single-threaded backups is the whole DataModel; the
+                decoded sessions are released once the metadata is loaded.
+            max_workers (int, optional): Worker processes used to decode column data, None for one per CPU.
+            reuse_storage (bool): Map the image already at storage_path, if there is one, instead of
+                decompressing the PBIX file. The image is not checked against the PBIX file; use cache_dir
+                to have images matched by content.
+        """
+        disk_backed = disk_backed or storage_path is not None or cache_dir is not None
+        unpacker = PbixUnpacker(file_path, lazy=lazy or (metadata_only and not disk_backed), disk_backed=disk_backed,
+                                storage_path=storage_path, cache_dir=cache_dir, cache_max_bytes=cache_max_bytes,
+                                reuse_storage=reuse_storage)
         
-        self._metadata_handler = MetadataHandler(unpacker.data_model)
-        self._vertipaq_decoder = VertiPaqDecoder(self._metadata_handler.metadata, unpacker.data_model)
+        self._data_model = unpacker.data_model
+        self._metadata_handler = MetadataHandler(self._data_model)
+        if metadata_only and isinstance(self._data_model.decompressed_data, Xpress9Stream):
+            # The metadata is a copy, so keep no decoded sessions until column data is requested
+            self._data_model.decompressed_data.close()
+        self._max_workers = max_workers
+        self.__vertipaq_decoder = None
+
+    @property
+    def _vertipaq_decoder(self):
+        # Built on first use, so metadata-only callers never touch column data
+        if self.__vertipaq_decoder is None:
+            self.__vertipaq_decoder = VertiPaqDecoder(self._metadata_handler.metadata, self._data_model, self._max_workers)
+        return self.__vertipaq_decoder
         
-    def get_table(self, table_name):
-        """Generates a DataFrame representation of the specified table."""
-        return self._vertipaq_decoder.get_table(table_name)
+    def get_table(self, table_name, columns=None, categorical=False, filters=None, limit=None, offset=0):
+        """
+        Generates a DataFrame representation of the specified table.
+        With `columns` only the listed columns are read; unknown column names raise a ValueError.
+        With `categorical=True` string columns are returned as pandas categoricals.
+        With `filters`, a list of (column, operator, value) tuples such as ("Region", "in", ["East"]),
+        only the matching rows are decoded and returned, indexed by their row number.
+        With `limit` and `offset` only up to `limit` rows starting at row `offset` are decoded,
+        e.g. get_table(table_name, limit=100) for a quick preview of a large table.
+        """
+        return self._vertipaq_decoder.get_table(table_name, columns=columns, categorical=categorical, filters=filters,
+                                                limit=limit, offset=offset)
+
+    def aggregate(self, table_name, column, ops, group_by=None):
+        """
+        Computes aggregates of a column, such as ["count", "sum", "min", "max"], optionally per value
+        of the `group_by` column, from the encoded column data without decoding every row.
+        """
+        return self._vertipaq_decoder.aggregate(table_name, column, ops, group_by=group_by)
+
+    def value_counts(self, table_name, column):
+        """Counts the rows holding each value of a column, without decoding every row."""
+        return self._vertipaq_decoder.value_counts(table_name, column)
+
+    def iter_table(self, table_name, batch_size=VertiPaqDecoder.DEFAULT_BATCH_SIZE, columns=None, categorical=False):
+        """
+        Yields the specified table as DataFrames of up to `batch_size` rows, decoding the
+        column data incrementally. Takes the same `columns` and `categorical` options as get_table.
+        """
+        return self._vertipaq_decoder.iter_table(table_name, batch_size=batch_size, columns=columns, categorical=categorical)
 
     def export_metadata_json(self, file_path=None, include_table_data=False):
         """
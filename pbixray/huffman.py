@@ -1,3 +1,5 @@
+import numpy as np
+
 class HuffmanTree:
     def __init__(self, c=0):
         self.c = c
@@ -77,3 +79,81 @@ def decode_substring(bitstream, tree, start_bit, end_bit):
         result += iso88591_to_utf8(node.c)
 
     return result
+
+
+class HuffmanDecoder:
+    """
+    Table-driven decoder of a compressed string page.
+
+    The lookup table is indexed by the next `width` bits of the stream and gives the symbol
+    and code length of the code those bits start with, so every step decodes a whole symbol
+    instead of walking the tree one bit at a time. The stream is stored with its 16-bit words
+    byte-swapped once up front, so bit positions map directly onto bytes.
+    """
+
+    def __init__(self, encode_array, bitstream):
+        codes = generate_codes(encode_array)
+        self.width = max((len(code) for code in codes.values()), default=1)
+        table_size = 1 << self.width
+        symbols = bytearray(table_size)
+        lengths = bytearray(table_size)  # a length of 0 marks bit patterns that start no code
+        for character, code in codes.items():
+            shift = self.width - len(code)
+            first = int(code, 2) << shift
+            last = first + (1 << shift)
+            symbols[first:last] = bytes([character]) * (last - first)
+            lengths[first:last] = bytes([len(code)]) * (last - first)
+        self.symbols = bytes(symbols)
+        self.lengths = bytes(lengths)
+
+        # Swap the bytes of each 16-bit word; pad so that every lookup can read three bytes
+        swapped = bytearray(bitstream)
+        if len(swapped) % 2:
+            swapped.append(0)
+        swapped[0::2], swapped[1::2] = swapped[1::2], swapped[0::2]
+        self.bitstream = bytes(swapped) + b'\x00\x00\x00'
+
+    def decode_bytes(self, start_bit, end_bit, output=None):
+        """
+        Decodes the codes that lie entirely within [start_bit, end_bit) as latin-1 bytes,
+        appending them to `output` if given.
+        """
+        if output is None:
+            output = bytearray()
+        bitstream = self.bitstream
+        symbols = self.symbols
+        lengths = self.lengths
+        width = self.width
+        window_shift = 24 - width
+        mask = (1 << width) - 1
+        bit_pos = start_bit
+        while bit_pos < end_bit:
+            byte_pos = bit_pos >> 3
+            window = ((bitstream[byte_pos] << 16 | bitstream[byte_pos + 1] << 8 | bitstream[byte_pos + 2])
+                      >> (window_shift - (bit_pos & 7))) & mask
+            length = lengths[window]
+            if length == 0:
+                raise ValueError(f"Invalid Huffman code at bit {bit_pos}.")
+            bit_pos += length
+            if bit_pos > end_bit:
+                break  # the last code is cut off by the end of the range
+            output.append(symbols[window])
+        return output
+
+    def decode_page(self, start_bits, end_bit):
+        """
+        Decodes all strings of a page in one pass into a shared latin-1 buffer.
+        String i spans the bits from start_bits[i] to the next start (or `end_bit` for the last one),
+        and the returned offsets array gives its byte range output[offsets[i]:offsets[i + 1]].
+        """
+        output = bytearray()
+        offsets = [0]
+        bounds = list(start_bits[1:]) + [end_bit]
+        for start, end in zip(start_bits, bounds):
+            self.decode_bytes(start, end, output)
+            offsets.append(len(output))
+        return output, np.array(offsets, dtype=np.int64)
+
+    def decode(self, start_bit, end_bit):
+        """Decodes the string stored between two bit positions, like `decode_substring`."""
+        return self.decode_bytes(start_bit, end_bit).decode('latin-1')
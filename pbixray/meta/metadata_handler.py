@@ -1,6 +1,6 @@
 from .metadata_query import MetadataQuery
 from .sqlite_handler import SQLiteHandler
-from ..utils import AMO_PANDAS_TYPE_MAPPING, WINDOWS_EPOCH_START, get_data_slice
+from ..utils import AMO_PANDAS_TYPE_MAPPING, WINDOWS_EPOCH_START, get_data_view
 import pandas as pd
 from ..abf.data_model import DataModel
 import datetime
@@ -15,7 +15,7 @@ class MetadataHandler:
         
     def _load_metadata(self):
         """Loads metadata for the given PBIX file."""
-        sqliteBuffer = get_data_slice(self._data_model,'metadata.sqlitedb')
+        sqliteBuffer = get_data_view(self._data_model,'metadata.sqlitedb')
         sqliteHandler = SQLiteHandler(sqliteBuffer)
         self._meta = MetadataQuery(sqliteHandler)
     
@@ -23,19 +23,18 @@ class MetadataHandler:
         """Computes statistics from the metadata schema."""
         self._stats = self._meta.schema_df[['TableName', 'ColumnName', 'Cardinality']].copy()
         self._stats = self._stats.assign(
-            Dictionary=self._meta.schema_df['Dictionary'].map(self._get_file_size_from_log),
-            HashIndex=self._meta.schema_df['HIDX'].map(self._get_file_size_from_log),
-            DataSize=self._meta.schema_df['IDF'].map(self._get_file_size_from_log),
+            Dictionary=self._get_file_sizes_from_log(self._meta.schema_df['Dictionary']),
+            HashIndex=self._get_file_sizes_from_log(self._meta.schema_df['HIDX']),
+            DataSize=self._get_file_sizes_from_log(self._meta.schema_df['IDF']),
             ModifiedTime=self._meta.schema_df['ModifiedTime'].apply(
                 lambda x: WINDOWS_EPOCH_START + datetime.timedelta(seconds=x / 1e7)),
             StructureModifiedTime=self._meta.schema_df['StructureModifiedTime'].apply(
                 lambda x: WINDOWS_EPOCH_START + datetime.timedelta(seconds=x / 1e7))
         )
 
-    def _get_file_size_from_log(self, file_name):
-        """Utility to get the size of a file from the log using 'FileName'."""
-        file_ref = next((x for x in self._data_model.file_log if x['FileName'] == file_name), None)
-        return file_ref['Size'] if file_ref else 0 
+    def _get_file_sizes_from_log(self, file_names):
+        """Utility to get the sizes of a column of file names from the log, 0 for missing files."""
+        return pd.Series(self._data_model.file_log.sizes(file_names), index=file_names.index)
     
     @property
     def metadata(self):
@@ -47,7 +46,7 @@ class MetadataHandler:
     
     @property
     def size(self):
-        return sum([x['Size'] for x in self._data_model.file_log])
+        return self._data_model.file_log.total_size
     
     @property
     def schema(self):
@@ -0,0 +1,30 @@
+import concurrent.futures
+import os
+import threading
+
+# Process pools shared by all models, one per worker count
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+
+def resolve_workers(max_workers):
+    """Resolves a max_workers setting: None means one worker per CPU."""
+    if max_workers is None:
+        return os.cpu_count() or 1
+    return max(1, int(max_workers))
+
+
+def get_process_pool(max_workers):
+    """Returns a shared process pool with `max_workers` workers."""
+    with _process_pools_lock:
+        pool = _process_pools.get(max_workers)
+        if pool is None:
+            pool = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+            _process_pools[max_workers] = pool
+        return pool
+
+
+def split_batches(items, batch_count):
+    """Splits a list into at most `batch_count` contiguous batches of similar size."""
+    batch_size = -(-len(items) // max(1, batch_count))
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
@@ -1,21 +1,120 @@
 import zipfile
+import collections
 import concurrent.futures
+import mmap
+import os
+import shutil
+import tempfile
+import uuid
 from .abf import parser
 from .abf.data_model import DataModel
+from .abf.file_log import FileLog
+from .xpress9_stream import Xpress9Chunk, Xpress9Session, Xpress9Stream
+from .zip_entry_stream import ZipEntryStream
+from .cache import DataModelCache
 from xpress9 import Xpress9
 
 
+class DecompressedOutput:
+    """
+    Destination of the decompressed DataModel.
+    Data is accumulated in memory, or, when disk backed, written to a temporary or
+    caller-supplied file that is memory-mapped once complete.
+    The caller-supplied file is created, or truncated, as is; PbixUnpacker passes a unique
+    file and moves it into place once the DataModel is parsed.
+    """
+
+    def __init__(self, disk_backed=False, storage_path=None):
+        self.disk_backed = disk_backed or storage_path is not None
+        self.storage_path = storage_path
+        self._buffer = bytearray()
+        self._map = None
+        self._view = None
+        if not self.disk_backed:
+            self._file = None
+        elif storage_path is None:
+            self._file = tempfile.TemporaryFile()
+        else:
+            self._file = open(storage_path, 'w+b')
+
+    def write(self, data):
+        if self._file is None:
+            self._buffer.extend(data)
+        else:
+            self._file.write(data)
+
+    def copy_from(self, file_obj):
+        """Copies the remainder of a file object without holding all of it in memory."""
+        if self._file is None:
+            self._buffer.extend(file_obj.read())
+        else:
+            shutil.copyfileobj(file_obj, self._file)
+
+    def reserve(self, size):
+        """Allocates the whole output once and returns a writable memoryview over it."""
+        if self._file is None:
+            self._buffer = bytearray(size)
+            self._view = memoryview(self._buffer)
+        else:
+            self._file.truncate(size)
+            if size:
+                self._map = mmap.mmap(self._file.fileno(), size)
+                self._view = memoryview(self._map)
+            else:
+                self._view = memoryview(self._buffer)
+        return self._view
+
+    def finish(self):
+        """Returns the decompressed data as a bytearray or a read-only memory map."""
+        if self._view is not None:
+            self._view.release()
+        if self._file is None:
+            return self._buffer
+        try:
+            if self._map is not None:
+                self._map.flush()
+                self._map.close()
+            self._file.flush()
+            if os.fstat(self._file.fileno()).st_size == 0:
+                return bytearray()  # empty files cannot be mapped
+            # The map keeps its own handle, so the file can be closed (and a temporary file deleted)
+            return mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            self._file.close()
+
+
 class PbixUnpacker:
     # Constants for file signatures
     SINGLE_THREAD_SIGNATURE = "This backup was created using XPress9 compression."
     MULTI_THREAD_SIGNATURE = "This backup was created using multithreaded XPrs9."
     STREAM_STORAGE_SIGNATURE = b'\xff\xfe' + "STREAM_STORAGE_SIGNATURE_)!@#$%^&*(".encode('utf-16le')
+    # Number of single-threaded Xpress9 frames read ahead of the decoder
+    PIPELINE_DEPTH = 4
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, lazy=False, disk_backed=False, storage_path=None,
+                 cache_dir=None, cache_max_bytes=DataModelCache.DEFAULT_MAX_BYTES, reuse_storage=False):
         self.file_path = file_path
+        # When lazy, data is only read (and Xpress9 chunks decompressed) once a slice of it is requested.
+        # Single-threaded Xpress9 backups are one session that ABF parsing reads to its end, so they are
+        # still decompressed completely; multi-threaded and uncompressed backups are read as needed.
+        self.lazy = lazy
+        # When disk backed, the decompressed data is written to storage_path (or a temporary file) and memory-mapped
+        self.disk_backed = disk_backed or storage_path is not None or cache_dir is not None
+        self.storage_path = storage_path
+        # An image already at storage_path is mapped instead of decompressing the PBIX file again
+        self.reuse_storage = reuse_storage
+        # Decompressed models are reused from, or written to, the cache directory
+        self.cache = DataModelCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+        if self.lazy and self.disk_backed:
+            raise ValueError("Lazy decompression cannot be combined with disk backed storage or a cache.")
+        if self.cache is not None and storage_path is not None:
+            raise ValueError("A cache directory cannot be combined with a storage path.")
+        if reuse_storage and storage_path is None:
+            raise ValueError("Reusing storage requires a storage path.")
+        self.__output_path = None
 
         # Attributes populated during unpacking
-        self._data_model = DataModel(file_log=[], decompressed_data=b'')
+        self._data_model = DataModel(file_log=FileLog(), decompressed_data=b'')
         
         # Detect file type and unpack accordingly
         self.__unpack()
@@ -44,141 +143,214 @@ class PbixUnpacker:
         return "unknown"
 
     def __unpack(self):
+        if self.reuse_storage and os.path.exists(self.storage_path):
+            # Only the ABF structures are parsed, the image is shared with the processes that map it
+            with open(self.storage_path, 'rb') as image_file:
+                self._data_model.decompressed_data = mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ)
+            parser.AbfParser(self._data_model)
+            return
+
         with zipfile.ZipFile(self.file_path, 'r') as zip_ref:
-            # Open the DataModel file within the ZIP
-            with zip_ref.open('DataModel') as data_model_in_pbix:
-                file_type = self.__detect_file_type(data_model_in_pbix)
-                
-                if file_type == "uncompressed":
-                    self.__process_uncompressed(data_model_in_pbix)
-                elif file_type == "single_threaded":
-                    self.__process_single_threaded(data_model_in_pbix)
-                elif file_type == "multi_threaded":
-                    self.__process_multi_threaded(data_model_in_pbix)
-                else:
-                    raise RuntimeError("Unknown or unsupported DataModel file format")
-
-        # Parse the decompressed data
-        parser.AbfParser(self._data_model)
+            cache_key = None
+            if self.cache is not None:
+                cache_key = self.cache.key(zip_ref)
+                cached_data_model = self.cache.load(cache_key)
+                if cached_data_model is not None:
+                    # The image is memory-mapped and the file log restored, nothing left to parse
+                    self._data_model = cached_data_model
+                    return
+                self.__output_path = self.cache.temporary_image_path(cache_key)
+            elif self.storage_path is not None:
+                # Truncating storage_path would pull the pages from under the processes that map it,
+                # so the image is written to a new file and replaces the old one once complete
+                self.__output_path = f"{self.storage_path}.{uuid.uuid4().hex}.tmp"
+
+            try:
+                self.__decompress(zip_ref)
+                # Parse the decompressed data
+                parser.AbfParser(self._data_model)
+            except BaseException:
+                # Don't leave a partially written image behind
+                if self.__output_path is not None:
+                    DataModelCache.discard(self.__output_path)
+                raise
+
+        if cache_key is not None:
+            self.cache.store(cache_key, self._data_model, self.__output_path)
+        elif self.__output_path is not None:
+            os.replace(self.__output_path, self.storage_path)
+
+    def __decompress(self, zip_ref):
+        """Decompresses (or, when lazy, indexes) the DataModel entry of the open PBIX file."""
+        # Open the DataModel file within the ZIP
+        with zip_ref.open('DataModel') as data_model_in_pbix:
+            file_type = self.__detect_file_type(data_model_in_pbix)
+
+            if file_type == "uncompressed" and self.lazy:
+                self._data_model.decompressed_data = ZipEntryStream(self.file_path)
+            elif file_type == "uncompressed":
+                self.__process_uncompressed(data_model_in_pbix)
+            elif file_type in ("single_threaded", "multi_threaded") and self.lazy:
+                self.__index_chunks(data_model_in_pbix, file_type)
+            elif file_type == "single_threaded":
+                self.__process_single_threaded(data_model_in_pbix)
+            elif file_type == "multi_threaded":
+                self.__process_multi_threaded(data_model_in_pbix)
+            else:
+                raise RuntimeError("Unknown or unsupported DataModel file format")
 
     def __process_uncompressed(self, data_model_file):
         """Process an uncompressed DataModel file."""
         # For uncompressed files, we can just read the entire file
         data_model_file.seek(0)
-        all_data = data_model_file.read()
-        self._data_model.decompressed_data = bytearray(all_data)
+        output = self.__open_output()
+        output.copy_from(data_model_file)
+        self._data_model.decompressed_data = output.finish()
+
+    def __index_chunks(self, data_model_file, file_type):
+        """Builds the Xpress9 chunk index and exposes it as a lazily decompressed stream."""
+        if file_type == "single_threaded":
+            total_size = data_model_file.seek(0, 2)
+            data_model_file.seek(102)
+            chunks = []
+            uncompressed_offset = 0
+            while data_model_file.tell() < total_size:
+                chunk = self.__read_chunk_header(data_model_file, uncompressed_offset)
+                chunks.append(chunk)
+                uncompressed_offset += chunk.uncompressed_size
+            sessions = [Xpress9Session(chunks)]
+        else:
+            data_model_file.seek(102)
+            main_chunks_per_thread = int.from_bytes(data_model_file.read(8), 'little')
+            prefix_chunks_per_thread = int.from_bytes(data_model_file.read(8), 'little')
+            prefix_thread_count = int.from_bytes(data_model_file.read(8), 'little')
+            main_thread_count = int.from_bytes(data_model_file.read(8), 'little')
+            data_model_file.read(8)  # chunk_uncompressed_size
+
+            # Every thread group was compressed by its own encoder, so each one is a separate session
+            sessions = []
+            uncompressed_offset = 0
+            for thread_count, chunks_per_thread in ((prefix_thread_count, prefix_chunks_per_thread),
+                                                    (main_thread_count, main_chunks_per_thread)):
+                if thread_count == 0 or chunks_per_thread == 0:
+                    continue
+                for _ in range(thread_count):
+                    chunks = []
+                    for _ in range(chunks_per_thread):
+                        chunk = self.__read_chunk_header(data_model_file, uncompressed_offset)
+                        chunks.append(chunk)
+                        uncompressed_offset += chunk.uncompressed_size
+                    sessions.append(Xpress9Session(chunks))
+
+        self._data_model.decompressed_data = Xpress9Stream(self.file_path, sessions)
+
+    @staticmethod
+    def __read_chunk_header(data_model_file, uncompressed_offset):
+        """Reads a chunk header and skips over its payload."""
+        uncompressed_size = int.from_bytes(data_model_file.read(4), 'little')
+        compressed_size = int.from_bytes(data_model_file.read(4), 'little')
+        compressed_offset = data_model_file.tell()
+        data_model_file.seek(compressed_offset + compressed_size)
+        return Xpress9Chunk(compressed_offset, compressed_size, uncompressed_offset, uncompressed_size)
 
     def __process_single_threaded(self, data_model_file):
-        """Process a single-threaded Xpress9 compressed DataModel file."""
-        all_decompressed_data = bytearray()
+        """
+        Process a single-threaded Xpress9 compressed DataModel file.
+        All chunks belong to one Xpress9 session and have to go through the same decoder in order,
+        so reading the next frames from the zip is overlapped with decompressing on a decoder thread.
+        """
+        output = self.__open_output()
         total_size = data_model_file.seek(0, 2)  # Get total size of file
         data_model_file.seek(102)  # Skip signature
 
         # Create and initialize the xpress9 library
         xpress9_lib = Xpress9()
         try:
-            while data_model_file.tell() < total_size:
-                uncompressed_size = int.from_bytes(data_model_file.read(4), 'little')  # Read uint32 for uncompressed size
-                compressed_size = int.from_bytes(data_model_file.read(4), 'little')  # Read uint32 for compressed size
-                compressed_data = data_model_file.read(compressed_size)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as decoder_thread:
+                pending = collections.deque()
+                while data_model_file.tell() < total_size:
+                    uncompressed_size = int.from_bytes(data_model_file.read(4), 'little')  # Read uint32 for uncompressed size
+                    compressed_size = int.from_bytes(data_model_file.read(4), 'little')  # Read uint32 for compressed size
+                    compressed_data = data_model_file.read(compressed_size)
 
-                # Use the xpress9_lib to decompress
-                decompressed_chunk = xpress9_lib.decompress(
-                    compressed_data, uncompressed_size
-                )
-                
-                # Append decompressed data
-                all_decompressed_data.extend(decompressed_chunk)
+                    # Queue the frame on the decoder thread; a single worker keeps the chunks in order
+                    pending.append(decoder_thread.submit(xpress9_lib.decompress, compressed_data, uncompressed_size))
+
+                    # Bound the frames in flight, appending decompressed data as it becomes available
+                    if len(pending) >= self.PIPELINE_DEPTH:
+                        output.write(pending.popleft().result())
+
+                while pending:
+                    output.write(pending.popleft().result())
         finally:
             # Ensure the library is properly terminated
             del xpress9_lib
             
         # Populate the byte array of the data bundle
-        self._data_model.decompressed_data = all_decompressed_data
+        self._data_model.decompressed_data = output.finish()
 
     def __process_multi_threaded(self, data_model_file):
-        all_decompressed_data = bytearray()
         data_model_file.seek(102)
 
         main_chunks_per_thread = int.from_bytes(data_model_file.read(8), 'little')
         prefix_chunks_per_thread = int.from_bytes(data_model_file.read(8), 'little')
         prefix_thread_count = int.from_bytes(data_model_file.read(8), 'little')
         main_thread_count = int.from_bytes(data_model_file.read(8), 'little')
-        chunk_uncompressed_size = int.from_bytes(data_model_file.read(8), 'little')
-
-        # Process prefix chunks if there are any
-        if prefix_thread_count > 0 and prefix_chunks_per_thread > 0:
-            # Read all prefix chunks and group by thread
-            prefix_chunks = []
-            for _ in range(prefix_thread_count * prefix_chunks_per_thread):
-                uncompressed_size = int.from_bytes(data_model_file.read(4), 'little')
-                compressed_size = int.from_bytes(data_model_file.read(4), 'little')
-                compressed_data = data_model_file.read(compressed_size)
-                prefix_chunks.append((uncompressed_size, compressed_data))
-
-            prefix_groups = [prefix_chunks[i*prefix_chunks_per_thread : (i+1)*prefix_chunks_per_thread]
-                            for i in range(prefix_thread_count)]
-
-            # Process prefix groups in parallel, maintaining order
-            if prefix_thread_count > 0:  # Ensure we only create a ThreadPoolExecutor if we have threads
-                with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, prefix_thread_count)) as executor:
-                    future_to_group = {executor.submit(self.__process_chunk_group, group): idx 
-                                    for idx, group in enumerate(prefix_groups)}
-                    # Collect results in original order
-                    ordered_results = [None] * len(prefix_groups)
-                    for future in concurrent.futures.as_completed(future_to_group):
-                        idx = future_to_group[future]
-                        ordered_results[idx] = future.result()
-                    
-                    for result in ordered_results:
-                        if result:
-                            all_decompressed_data.extend(result)
-        
-        # Process main chunks if there are any
-        if main_thread_count > 0 and main_chunks_per_thread > 0:
-            # Read all main chunks and group by thread
-            main_chunks = []
-            for _ in range(main_thread_count * main_chunks_per_thread):
-                uncompressed_size = int.from_bytes(data_model_file.read(4), 'little')
-                compressed_size = int.from_bytes(data_model_file.read(4), 'little')
-                compressed_data = data_model_file.read(compressed_size)
-                main_chunks.append((uncompressed_size, compressed_data))
-
-            main_groups = [main_chunks[i*main_chunks_per_thread : (i+1)*main_chunks_per_thread]
-                        for i in range(main_thread_count)]
-
-            # Process main groups in parallel, maintaining order
-            if main_thread_count > 0:  # Ensure we only create a ThreadPoolExecutor if we have threads
-                with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, main_thread_count)) as executor:
-                    future_to_group = {executor.submit(self.__process_chunk_group, group): idx 
-                                    for idx, group in enumerate(main_groups)}
-                    # Collect results in original order
-                    ordered_results = [None] * len(main_groups)
-                    for future in concurrent.futures.as_completed(future_to_group):
-                        idx = future_to_group[future]
-                        ordered_results[idx] = future.result()
-                    
-                    for result in ordered_results:
-                        if result:
-                            all_decompressed_data.extend(result)
-
-        self._data_model.decompressed_data = all_decompressed_data
-
-    def __process_chunk_group(self, chunk_group):
+        data_model_file.read(8)  # chunk_uncompressed_size
+
+        # Read the prefix and main chunks and group them by thread, recording where each group's output starts
+        groups = []
+        total_size = 0
+        for thread_count, chunks_per_thread in ((prefix_thread_count, prefix_chunks_per_thread),
+                                                (main_thread_count, main_chunks_per_thread)):
+            if thread_count == 0 or chunks_per_thread == 0:
+                continue
+            for _ in range(thread_count):
+                group = []
+                group_offset = total_size
+                for _ in range(chunks_per_thread):
+                    uncompressed_size = int.from_bytes(data_model_file.read(4), 'little')
+                    compressed_size = int.from_bytes(data_model_file.read(4), 'little')
+                    compressed_data = data_model_file.read(compressed_size)
+                    group.append((uncompressed_size, compressed_data))
+                    total_size += uncompressed_size
+                groups.append((group_offset, total_size, group))
+
+        # The final size is known, so allocate once and let every thread decompress into its own slice
+        output = self.__open_output()
+        output_view = output.reserve(total_size)
+        if groups:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(prefix_thread_count, main_thread_count, 1)) as executor:
+                futures = [executor.submit(self.__process_chunk_group, group, output_view[start:end])
+                           for start, end, group in groups]
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+
+        self._data_model.decompressed_data = output.finish()
+
+    def __open_output(self):
+        return DecompressedOutput(self.disk_backed, self.__output_path)
+
+    def __process_chunk_group(self, chunk_group, output_view):
+        """Decompresses a thread group's chunks in order, straight into its slice of the output."""
         if not chunk_group:
-            return bytearray()
-            
+            return
+
         xpress9_lib = Xpress9()
-        decompressed = bytearray()
+        position = 0
         try:
             for uncompressed_size, compressed_data in chunk_group:
                 decompressed_chunk = xpress9_lib.decompress(
                     compressed_data, uncompressed_size
                 )
-                decompressed.extend(decompressed_chunk)
+                if len(decompressed_chunk) != uncompressed_size:
+                    raise ValueError(f"Xpress9 chunk decompressed to {len(decompressed_chunk)} bytes, "
+                                     f"its header declares {uncompressed_size}.")
+                output_view[position:position + uncompressed_size] = decompressed_chunk
+                position += uncompressed_size
         finally:
             del xpress9_lib
-        return decompressed
+            output_view.release()
 
     @property
     def data_model(self):
@@ -0,0 +1,94 @@
+from collections.abc import Mapping
+import numbers
+import numpy as np
+from .huffman import HuffmanDecoder, decompress_encode_array
+
+
+class StringDictionary(Mapping):
+    """
+    Values of a string dictionary in the Arrow string layout: one contiguous UTF-8 buffer and
+    an offsets array where string i spans data[offsets[i]:offsets[i + 1]].
+
+    Data ids map to strings like the dict it replaces, starting at `min_data_id`; Python `str`
+    objects are only created for the values that are looked up.
+    """
+
+    def __init__(self, data: bytes, offsets: np.ndarray, min_data_id: int = 0):
+        self.data = data
+        self.offsets = offsets
+        self.min_data_id = min_data_id
+
+    @classmethod
+    def from_pages(cls, pages, min_data_id: int = 0):
+        """Concatenates the (UTF-8 buffer, offsets) pairs of several dictionary pages."""
+        buffers = [data for data, _ in pages]
+        offsets = [np.zeros(1, dtype=np.int64)]
+        base = 0
+        for data, page_offsets in pages:
+            offsets.append(page_offsets[1:] + base)
+            base += len(data)
+        return cls(b''.join(buffers), np.concatenate(offsets), min_data_id)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        return iter(range(self.min_data_id, self.min_data_id + len(self)))
+
+    def __contains__(self, data_id):
+        return isinstance(data_id, numbers.Integral) and 0 <= data_id - self.min_data_id < len(self)
+
+    def __getitem__(self, data_id):
+        if data_id not in self:
+            raise KeyError(data_id)
+        index = data_id - self.min_data_id
+        return self.data[int(self.offsets[index]):int(self.offsets[index + 1])].decode('utf-8')
+
+    def to_list(self):
+        """Materialises all values as a list of `str`."""
+        offsets = self.offsets.tolist()
+        if self.data.isascii():
+            # Byte offsets are character offsets, slice a single decoded string
+            text = self.data.decode('ascii')
+            return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+        data = self.data
+        return [data[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+
+    def to_numpy(self):
+        """Materialises all values as a dense object array, indexed by `data_id - min_data_id`."""
+        values = np.empty(len(self), dtype=object)
+        values[:] = self.to_list()
+        return values
+
+
+def latin1_page(data: bytearray, offsets: np.ndarray):
+    """Converts a page of latin-1 encoded strings to UTF-8, shifting the offsets past widened characters."""
+    if data.isascii():
+        return bytes(data), offsets
+    # Every character from U+0080 to U+00FF takes two bytes in UTF-8
+    widened = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum(np.frombuffer(data, dtype=np.uint8) >= 0x80, out=widened[1:])
+    return data.decode('latin-1').encode('utf-8'), offsets + widened[offsets]
+
+
+def zero_terminated_page(text: str):
+    """Splits a page of zero-terminated strings into a UTF-8 buffer and offsets, dropping the terminators."""
+    encoded = np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+    # UTF-8 only produces zero bytes for the terminators themselves
+    terminators = np.flatnonzero(encoded == 0)
+    end = terminators[-1] if len(terminators) else 0
+    characters = encoded[:end]
+    data = characters[characters != 0].tobytes()
+    offsets = np.zeros(len(terminators) + 1, dtype=np.int64)
+    offsets[1:] = terminators - np.arange(len(terminators))
+    return data, offsets
+
+
+def decode_compressed_page(encode_array, compressed_string_buffer, start_bits, store_total_bits):
+    """
+    Decodes a Huffman compressed page into a UTF-8 buffer and offsets.
+    Takes plain buffers and lists only, so that pages can be shipped to worker processes.
+    """
+    decoder = HuffmanDecoder(decompress_encode_array(encode_array), compressed_string_buffer)
+    data, offsets = decoder.decode_page(start_bits, store_total_bits)
+    return latin1_page(data, offsets)
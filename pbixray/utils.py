@@ -1,5 +1,8 @@
 from .abf.data_model import DataModel
+import bisect
 import datetime
+import io
+import mmap
 from .xpress8 import Xpress8
 
 # ---------- CONSTANTS ----------
@@ -17,26 +20,139 @@ AMO_PANDAS_TYPE_MAPPING = {
 WINDOWS_EPOCH_START = datetime.datetime(1601, 1, 1)
 
 # ---------- UTILITY FUNCTIONS ----------
-def get_data_slice(data_model:DataModel, file_name:str) -> bytes:
-    """Gets a data slice based on a file name from the file log."""
-    file_ref = next((x for x in data_model.file_log if x['FileName'] == file_name), None)
+def _get_file_range(data_model:DataModel, file_name:str):
+    """Finds a file in the file log and returns it with its byte range in the decompressed data."""
+    file_ref = data_model.file_log.get(file_name)
     if not file_ref:
         raise ValueError(f"File reference not found for filename: {file_name}.")
+    start = file_ref['m_cbOffsetHeader']
     # if error_code trim last 4 bytes
-    if data_model.error_code:
-        raw_slice =  data_model.decompressed_data[file_ref['m_cbOffsetHeader']:file_ref['m_cbOffsetHeader'] + file_ref['Size']-4]
-    else:
-        raw_slice =  data_model.decompressed_data[file_ref['m_cbOffsetHeader']:file_ref['m_cbOffsetHeader'] + file_ref['Size']]
+    end = start + file_ref['Size'] - (4 if data_model.error_code else 0)
+    return file_ref, start, end
+
+def _decompress_file(file_ref, file_name:str, raw_slice, max_workers=1) -> bytearray:
+    """Decompresses an Xpress8 compressed file and validates its size against the log."""
+    decompressed_data = Xpress8.decompress_chunked(raw_slice, max_workers=max_workers)
+
+    # Validate the size of the decompressed data against the expected size from log
+    if len(decompressed_data) != file_ref['SizeFromLog']:
+        raise ValueError(
+            f"Decompression size mismatch for file '{file_name}': "
+            f"Expected {file_ref['SizeFromLog']} bytes, got {len(decompressed_data)} bytes"
+        )
+    return decompressed_data
+
+def _view_range(decompressed_data, start:int, end:int) -> memoryview:
+    """Returns a range of the decompressed data as a memoryview, without copying in-memory and mapped data."""
+    if isinstance(decompressed_data, (bytes, bytearray, mmap.mmap)):
+        return memoryview(decompressed_data)[start:end]
+    # Lazily read data models only materialise the requested range
+    return memoryview(decompressed_data[start:end])
+
+def _get_chunk_directory(data_model:DataModel, file_name:str, start:int, end:int):
+    """
+    Returns the Xpress8 chunk directory of a compressed file: the uncompressed offsets of its chunks
+    and their (absolute input offset, compressed size, uncompressed offset, uncompressed size) entries.
+    """
+    directory = data_model.chunk_directories.get(file_name)
+    if directory is None:
+        chunk_table = Xpress8.read_chunk_table(_view_range(data_model.decompressed_data, start, end))
+        entries = [(start + offset, size, output_offset, uncompressed_size)
+                   for offset, size, output_offset, uncompressed_size in chunk_table]
+        directory = ([entry[2] for entry in entries], entries)
+        data_model.chunk_directories[file_name] = directory
+    return directory
+
+def _decompress_range(data_model:DataModel, file_name:str, start:int, end:int, offset:int, length) -> bytearray:
+    """Decompresses only the Xpress8 chunks of a compressed file that overlap the requested range."""
+    output_offsets, entries = _get_chunk_directory(data_model, file_name, start, end)
+    total_size = entries[-1][2] + entries[-1][3] if entries else 0
+    range_end = total_size if length is None else min(total_size, offset + length)
+    if offset >= range_end:
+        return bytearray()
+
+    first = max(0, bisect.bisect_right(output_offsets, offset) - 1)
+    last = bisect.bisect_left(output_offsets, range_end)
+    decompressed_data = bytearray()
+    for input_offset, size, _, uncompressed_size in entries[first:last]:
+        compressed_chunk = _view_range(data_model.decompressed_data, input_offset, input_offset + size)
+        decompressed_data += Xpress8.decompress(compressed_chunk, uncompressed_size)
+
+    chunk_start = entries[first][2]
+    return decompressed_data[offset - chunk_start:range_end - chunk_start]
+
+def get_data_slice(data_model:DataModel, file_name:str, offset:int=0, length:int=None) -> bytes:
+    """
+    Gets a data slice based on a file name from the file log.
+    With `offset` and/or `length` only that byte range of the (decompressed) file is returned;
+    on compressed backups only the Xpress8 chunks overlapping the range are decompressed.
+    """
+    if offset or length is not None:
+        return bytearray(get_data_view(data_model, file_name, offset=offset, length=length))
+
+    file_ref, start, end = _get_file_range(data_model, file_name)
+    raw_slice = data_model.decompressed_data[start:end]
+
+    if data_model.apply_compression:
+        return _decompress_file(file_ref, file_name, raw_slice)
+    return raw_slice
+
+def get_data_view(data_model:DataModel, file_name:str, max_workers=1, offset:int=0, length:int=None) -> memoryview:
+    """
+    Gets a data slice based on a file name from the file log as a memoryview.
+    The view shares memory with the decompressed data (or with the Xpress8 decompressed file)
+    instead of copying it. Xpress8 compressed files are decoded with up to `max_workers` processes.
+    With `offset` and/or `length` only that byte range of the (decompressed) file is returned.
+    """
+    file_ref, start, end = _get_file_range(data_model, file_name)
+    ranged = offset or length is not None
 
     if data_model.apply_compression:
-        decompressed_data = Xpress8.decompress_chunked(raw_slice)
-        
-        # Validate the size of the decompressed data against the expected size from log
-        if len(decompressed_data) != file_ref['SizeFromLog']:
-            raise ValueError(
-                f"Decompression size mismatch for file '{file_name}': "
-                f"Expected {file_ref['SizeFromLog']} bytes, got {len(decompressed_data)} bytes"
-            )
-            
-        return decompressed_data
-    return raw_slice
\ No newline at end of file
+        if ranged:
+            return memoryview(_decompress_range(data_model, file_name, start, end, offset, length))
+        return memoryview(_decompress_file(file_ref, file_name, _view_range(data_model.decompressed_data, start, end), max_workers))
+
+    if ranged:
+        start = min(end, start + offset)
+        end = end if length is None else min(end, start + length)
+    return _view_range(data_model.decompressed_data, start, end)
+
+class BufferReader(io.RawIOBase):
+    """Seekable raw stream over a buffer that reads without copying the buffer itself."""
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer).cast('B')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        chunk = self._view[self._position:self._position + len(b)]
+        size = len(chunk)
+        b[:size] = chunk
+        self._position += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+def open_buffer(buffer) -> io.BufferedReader:
+    """Opens a buffer (e.g. a memoryview from get_data_view) as a binary stream, without copying it."""
+    return io.BufferedReader(BufferReader(buffer))
@@ -1,96 +1,427 @@
 # ---------- IMPORTS ----------
-from .column_data.idf import ColumnDataIdf
+from .column_data.idf_reader import iter_idf, read_idf
 from .column_data.idfmeta import IdfmetaParser
 from .column_data.hidx import ColumnDataHidx
 from .column_data.dictionary import ColumnDataDictionary
 from .abf.backup_log import BackupLog
 from .abf.virtual_directory import VirtualDirectory
 from kaitaistruct import KaitaiStream
-from .utils import AMO_PANDAS_TYPE_MAPPING, get_data_slice
-import io
+from .utils import AMO_PANDAS_TYPE_MAPPING, get_data_view, open_buffer
+import numpy as np
+import struct
 import pandas as pd
+from pandas.api.extensions import take
 from decimal import Decimal
 from .abf.data_model import DataModel
 
-from .huffman import decompress_encode_array,build_huffman_tree, decode_substring
+from .string_dictionary import StringDictionary, decode_compressed_page, zero_terminated_page
+from .parallel import get_process_pool, resolve_workers
 from collections import defaultdict
 
 # ---------- VertiPaq CLASS ----------
 
+class _SegmentRuns:
+    """
+    Runs of the primary segment of an IDF segment, expandable by row range. A run is either a value
+    repeated repeat_value times, or a bit pack marker standing for the next repeat_value bitpacked values.
+    """
+
+    def __init__(self, data_values, repeat_values, bitpacked_count):
+        self.data_values = np.asarray(data_values, dtype=np.int64)
+        run_lengths = np.asarray(repeat_values, dtype=np.int64).copy()
+
+        # The marker value is offset by the bitpacked values used so far, so markers are found in order.
+        # That offset never exceeds the rows of the runs before, so only values that close to 0xFFFFFFFF are tested.
+        rows_before = np.cumsum(run_lengths) - run_lengths
+        candidates = np.flatnonzero(self.data_values >= 0xFFFFFFFF - rows_before)
+        marker_runs = []
+        marker_offsets = []
+        bit_packed_offset = 0
+        for run, data_value in zip(candidates.tolist(), self.data_values[candidates].tolist()):
+            if data_value + bit_packed_offset == 0xFFFFFFFF: # bit pack marker
+                marker_runs.append(run)
+                marker_offsets.append(bit_packed_offset)
+                bit_packed_offset += int(run_lengths[run])
+                # Runs past the end of the bitpacked values are cut short
+                run_lengths[run] = max(0, min(int(run_lengths[run]), bitpacked_count - marker_offsets[-1]))
+
+        self.run_ends = np.cumsum(run_lengths)
+        self.run_starts = self.run_ends - run_lengths
+        self.marker_runs = np.array(marker_runs, dtype=np.int64)
+        self.marker_offsets = np.array(marker_offsets, dtype=np.int64)
+        self.row_count = int(self.run_ends[-1]) if len(self.run_ends) else 0
+
+    def expand(self, start, end, read_bitpacked):
+        """
+        Returns the values of rows [start, end) as an int64 array, reading the bitpacked values
+        [first, last) of marker runs with read_bitpacked(first, last).
+        """
+        first_run = int(np.searchsorted(self.run_ends, start, side='right'))
+        last_run = int(np.searchsorted(self.run_ends, end, side='left')) + 1
+        lengths = (np.minimum(self.run_ends[first_run:last_run], end)
+                   - np.maximum(self.run_starts[first_run:last_run], start))
+        # One pass over the runs fills the values of RLE runs, then the bitpacked runs are copied in
+        vector = np.repeat(self.data_values[first_run:last_run], np.maximum(lengths, 0))
+
+        first_marker = int(np.searchsorted(self.marker_runs, first_run))
+        last_marker = int(np.searchsorted(self.marker_runs, last_run))
+        for marker in range(first_marker, last_marker):
+            run = self.marker_runs[marker]
+            run_start = int(self.run_starts[run])
+            low = max(run_start, start)
+            high = min(int(self.run_ends[run]), end)
+            if high > low:
+                bit_packed_start = int(self.marker_offsets[marker]) + low - run_start
+                vector[low - start:high - start] = read_bitpacked(bit_packed_start, bit_packed_start + high - low)
+        return vector
+
+    def mask(self, predicate, read_bitpacked):
+        """
+        Returns a boolean array of the rows whose value satisfies `predicate`, a function from an
+        int64 array of values to a boolean array. RLE runs are tested once and accepted or skipped whole.
+        """
+        # Marker values are not column values (and may not even convert), so only RLE runs are tested here
+        is_rle = np.ones(len(self.data_values), dtype=bool)
+        is_rle[self.marker_runs] = False
+        run_matches = np.zeros(len(self.data_values), dtype=bool)
+        run_matches[is_rle] = predicate(self.data_values[is_rle])
+        matches = np.repeat(run_matches, self.run_ends - self.run_starts)
+        for run, bit_packed_start in zip(self.marker_runs.tolist(), self.marker_offsets.tolist()):
+            start = int(self.run_starts[run])
+            end = int(self.run_ends[run])
+            if end > start:
+                matches[start:end] = predicate(read_bitpacked(bit_packed_start, bit_packed_start + end - start))
+        return matches
+
+    def take(self, rows, read_bitpacked):
+        """Returns the values of the given sorted rows as an int64 array, without expanding the runs."""
+        runs = np.searchsorted(self.run_ends, rows, side='right')
+        vector = self.data_values[runs]
+        in_marker = np.isin(runs, self.marker_runs)
+        if in_marker.any():
+            marker_runs = runs[in_marker]
+            markers = np.searchsorted(self.marker_runs, marker_runs)
+            bit_packed_rows = self.marker_offsets[markers] + rows[in_marker] - self.run_starts[marker_runs]
+            first = int(bit_packed_rows[0])
+            vector[in_marker] = read_bitpacked(first, int(bit_packed_rows[-1]) + 1)[bit_packed_rows - first]
+        return vector
+
+    def intervals(self, read_bitpacked):
+        """
+        Returns the segment as intervals of rows holding the same value, as arrays of values and lengths.
+        RLE runs stay a single interval, bit pack marker runs become one interval per bitpacked value.
+        """
+        run_lengths = self.run_ends - self.run_starts
+        is_marker = np.zeros(len(self.data_values), dtype=bool)
+        is_marker[self.marker_runs] = True
+        interval_counts = np.where(is_marker, run_lengths, 1)
+        values = np.repeat(self.data_values, interval_counts)
+        lengths = np.repeat(np.where(is_marker, 1, run_lengths), interval_counts)
+
+        interval_starts = np.cumsum(interval_counts) - interval_counts
+        for run, bit_packed_start in zip(self.marker_runs.tolist(), self.marker_offsets.tolist()):
+            start = int(interval_starts[run])
+            count = int(run_lengths[run])
+            values[start:start + count] = read_bitpacked(bit_packed_start, bit_packed_start + count)
+        in_use = lengths > 0
+        return values[in_use], lengths[in_use]
+
+
 class VertiPaqDecoder:
-    def __init__(self, metadata, data_model:DataModel):
+    # Rows per DataFrame yielded by iter_table
+    DEFAULT_BATCH_SIZE = 100_000
+    # Fewest compressed pages in a string dictionary worth decoding on the process pool
+    PARALLEL_MIN_PAGES = 2
+    # Dictionary type and hash information preceding the values of long and real dictionaries
+    NUMBER_DICTIONARY_HEADER_SIZE = 28
+    # Fewest IDF segments in a column worth decoding on the process pool
+    PARALLEL_MIN_SEGMENTS = 2
+    # Tags of the column partition and column segment elements of idfmeta files
+    IDFMETA_CP_TAG = b"<1:CP\x00"
+    IDFMETA_CP_TAG_END = b"CP:1>\x00"
+    IDFMETA_CS_TAG = b"<1:CS\x00"
+    # Operators of get_table filters, applied to the converted values of a column
+    FILTER_OPERATORS = {
+        '==': lambda values, value: values == value,
+        '=': lambda values, value: values == value,
+        '!=': lambda values, value: values != value,
+        '<': lambda values, value: values < value,
+        '<=': lambda values, value: values <= value,
+        '>': lambda values, value: values > value,
+        '>=': lambda values, value: values >= value,
+        'in': lambda values, value: values.isin(value),
+        'not in': lambda values, value: ~values.isin(value),
+    }
+    # Operations of aggregate, computed from the distinct values of a column and the rows holding them
+    # ('value': distinct values, 'rows': their non-null row counts, 'total': value × rows, only for sum and mean)
+    AGGREGATE_OPERATIONS = {
+        'count': lambda data: data['rows'].sum(),
+        'sum': lambda data: data['total'].sum(),
+        'mean': lambda data: data['total'].sum() / data['rows'].sum(),
+        'min': lambda data: data['value'].min(),
+        'max': lambda data: data['value'].max(),
+        'nunique': lambda data: data['value'].nunique(),
+    }
+    # Operations of aggregate that need the 'total' of the values, and the data types they apply to
+    # (whole numbers, real numbers, decimals and booleans)
+    TOTAL_OPERATIONS = ('sum', 'mean')
+    NUMERIC_DATA_TYPES = (6, 8, 10, 11)
+
+    def __init__(self, metadata, data_model:DataModel, max_workers=1):
         self._meta = metadata
         self._data_model = data_model
+        # Worker processes used for decoding, None for one per CPU
+        self._max_workers = max_workers
 
-    def _read_bitpacked(self,sub_segment, bit_width, min_data_id):
-        """Reads bitpacked values from a sub_segment."""
-        mask = (1 << bit_width) - 1
-        res = []
-        for u8le in sub_segment:
-            for _ in range(64 // bit_width):
-                res.append((min_data_id + (u8le & mask)))
-                u8le >>= bit_width
-
-        return res
-
-    def _extract_strings(self,buffer):
-        """Extract zero-terminated strings from buffer."""
-        strings = buffer.split('\0')
-        return strings[:-1]  # remove the last empty string
-
-    def _read_rle_bit_packed_hybrid(self,buffer, entries, min_data_id, bit_width ):
-        """Reads RLE bit packed hybrid values from a buffer."""
-        with io.BytesIO(buffer) as f:
-            # Parse the binary data
-            column_data = ColumnDataIdf(KaitaiStream(f))
-            
-            bitpacked_values = []
-            vector = []
-            bit_packed_entries = None
-            bit_packed_offset = 0
-            
-            if entries > 0:
-                # Get bit width
-                size = column_data.segments[0].sub_segment_size
-                # case if it's a column with empty strings
-                if column_data.segments[0].sub_segment[-1].bit_length() == 0 and size == 1:
-                    bitpacked_values = [min_data_id] * entries
-                else:
-                    # read the bitpacked values from the sub_segment
-                    bitpacked_values = self._read_bitpacked(column_data.segments[0].sub_segment,bit_width, min_data_id)
-
-            # consider only the first primary segment + sub segment combination
-            # for segment in column_data.segments: 
-            for entry in column_data.segments[0].primary_segment:
-                if entry.data_value+bit_packed_offset== 0xFFFFFFFF: # bit pack marker
-                    bit_packed_entries = entry.repeat_value
-                    bitpacked_values_slice = bitpacked_values[bit_packed_offset:bit_packed_offset+bit_packed_entries]
-                    bit_packed_offset += bit_packed_entries
-                    vector+=bitpacked_values_slice
-                else:
-                    rle = [entry.data_value] * entry.repeat_value
-                    vector+=rle
+    @staticmethod
+    def _read_bitpacked(sub_segment, bit_width, min_data_id):
+        """
+        Reads bitpacked values from a sub_segment of u64 words, each holding 64 // bit_width values
+        starting at the least significant bits. Returns an int64 array.
+        """
+        words = np.asarray(sub_segment, dtype=np.uint64)
+        lanes = 64 // bit_width
+        mask = np.uint64((1 << bit_width) - 1)
+        # Unpack lane by lane into an array of the smallest type that holds bit_width bits
+        unpacked = np.empty((len(words), lanes), dtype=VertiPaqDecoder._unpacked_dtype(bit_width))
+        for lane in range(lanes):
+            unpacked[:, lane] = (words >> np.uint64(lane * bit_width)) & mask
+        return unpacked.reshape(-1).astype(np.int64) + min_data_id
+
+    @staticmethod
+    def _unpacked_dtype(bit_width):
+        for dtype in (np.uint8, np.uint16, np.uint32):
+            if bit_width <= np.iinfo(dtype).bits:
+                return dtype
+        return np.uint64
+
+    @staticmethod
+    def _expand_rle_bit_packed_hybrid(data_values, repeat_values, bitpacked_values):
+        """
+        Expands the runs of a primary segment into an int64 array. A run is either a value repeated
+        repeat_value times, or a bit pack marker standing for the next repeat_value bitpacked values.
+        """
+        runs = _SegmentRuns(data_values, repeat_values, len(bitpacked_values))
+        return runs.expand(0, runs.row_count, lambda first, last: bitpacked_values[first:last])
+
+    @staticmethod
+    def _bitpacked_reader(sub_segment, entries, min_data_id, bit_width):
+        """
+        Returns the number of bitpacked values of a segment and a function reading the values
+        [first, last) of them, unpacking only the sub segment words that hold them.
+        """
+        if entries <= 0:
+            return 0, lambda first, last: np.empty(0, dtype=np.int64)
+        # case if it's a column with empty strings
+        if len(sub_segment) == 1 and sub_segment[-1] == 0:
+            return entries, lambda first, last: np.full(last - first, min_data_id, dtype=np.int64)
+
+        lanes = 64 // bit_width
+        def read(first, last):
+            first_word = first // lanes
+            values = VertiPaqDecoder._read_bitpacked(sub_segment[first_word:-(-last // lanes)], bit_width, min_data_id)
+            return values[first - first_word * lanes:last - first_word * lanes]
+        return len(sub_segment) * lanes, read
+
+    @staticmethod
+    def _decode_segment(data_values, repeat_values, sub_segment, entries, min_data_id, bit_width):
+        """Decodes one IDF segment from its primary segment runs and sub segment words."""
+        bitpacked_count, read_bitpacked = VertiPaqDecoder._bitpacked_reader(sub_segment, entries, min_data_id, bit_width)
+        # read the bitpacked values from the sub_segment
+        bitpacked_values = read_bitpacked(0, bitpacked_count)
+        return VertiPaqDecoder._expand_rle_bit_packed_hybrid(data_values, repeat_values, bitpacked_values)
 
-            return vector
+    def _segment_payloads(self, buffer, segments, null_adjustment):
+        """Pairs the segments of an IDF with their idfmeta segments as _decode_segment arguments."""
+        # Segments are NumPy views over the buffer
+        idf_segments = read_idf(buffer)
+
+        if len(idf_segments) != len(segments):
+            raise ValueError(f"IDF has {len(idf_segments)} segments but its idfmeta describes {len(segments)}.")
+
+        return [self._segment_payload(segment, segment_meta, null_adjustment)
+                for segment, segment_meta in zip(idf_segments, segments)]
+
+    @staticmethod
+    def _segment_payload(segment, segment_meta, null_adjustment):
+        """Returns the _decode_segment arguments of an IDF segment and its idfmeta segment."""
+        # The primary segment is allocated in larger blocks, only its first runs are in use
+        primary_segment = segment.primary_segment[:segment_meta['runs']]
+        return (
+            primary_segment['data_value'],
+            primary_segment['repeat_value'],
+            segment.sub_segment,
+            segment_meta['count_bit_packed'],
+            segment_meta['min_data_id'] - null_adjustment,
+            segment_meta['bit_width'],
+        )
+
+    def _read_segment_runs(self, buffer, segments, null_adjustment=0):
+        """Returns the run layout and bitpacked value reader of every segment of an IDF, without expanding them."""
+        segment_runs = []
+        for data_values, repeat_values, sub_segment, entries, min_data_id, bit_width in self._segment_payloads(buffer, segments, null_adjustment):
+            bitpacked_count, read_bitpacked = self._bitpacked_reader(sub_segment, entries, min_data_id, bit_width)
+            segment_runs.append((_SegmentRuns(data_values, repeat_values, bitpacked_count), read_bitpacked))
+        return segment_runs
+
+    def _mask_rle_bit_packed_hybrid(self, segment_runs, predicate):
+        """Evaluates a predicate on the values of an IDF, returning a boolean array over its rows."""
+        masks = [runs.mask(predicate, read_bitpacked) for runs, read_bitpacked in segment_runs]
+        return np.concatenate(masks) if masks else np.empty(0, dtype=bool)
+
+    def _take_rle_bit_packed_hybrid(self, segment_runs, rows):
+        """Returns the values of an IDF at the given sorted row positions."""
+        vectors = []
+        segment_start = 0
+        for runs, read_bitpacked in segment_runs:
+            segment_end = segment_start + runs.row_count
+            first, last = np.searchsorted(rows, [segment_start, segment_end])
+            if last > first:
+                vectors.append(runs.take(rows[first:last] - segment_start, read_bitpacked))
+            segment_start = segment_end
+        return np.concatenate(vectors) if vectors else np.empty(0, dtype=np.int64)
+
+    def _read_intervals(self, segment_runs):
+        """Returns the intervals of equal values of all segments of an IDF, as arrays of values and interval ends."""
+        intervals = [runs.intervals(read_bitpacked) for runs, read_bitpacked in segment_runs]
+        if not intervals:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        values, lengths = (np.concatenate(arrays) for arrays in zip(*intervals))
+        return values, np.cumsum(lengths)
+
+    @staticmethod
+    def _count_distinct(keys, weights):
+        """Sums the weights of equal keys (or equal columns of a 2-D keys array), returning the distinct keys and their totals."""
+        distinct, inverse = np.unique(keys, axis=-1, return_inverse=True)
+        totals = np.bincount(inverse.ravel(), weights=weights, minlength=distinct.shape[-1])
+        return distinct, totals.astype(np.int64)
+
+    def _iter_segment_runs(self, read, segments, null_adjustment=0):
+        """
+        Yields the run layout and bitpacked value reader of each segment of an IDF in turn, reading the
+        file through read(offset, length): a segment's runs in use are read when it is reached, and its
+        sub segment words only when read_bitpacked is called.
+        """
+        idf_segments = iter_idf(read)
+        for segment_meta in segments:
+            segment = next(idf_segments, None)
+            if segment is None:
+                raise ValueError(f"IDF has fewer segments than the {len(segments)} its idfmeta describes.")
+            data_values, repeat_values, sub_segment, entries, min_data_id, bit_width = self._segment_payload(segment, segment_meta, null_adjustment)
+            bitpacked_count, read_bitpacked = self._bitpacked_reader(sub_segment, entries, min_data_id, bit_width)
+            yield _SegmentRuns(data_values, repeat_values, bitpacked_count), read_bitpacked
+
+    def _iter_rle_bit_packed_hybrid(self, read, segments, batch_size, null_adjustment=0):
+        """
+        Yields the values of an IDF in int64 arrays of batch_size values (the last one may be shorter),
+        reading the file through read(offset, length). Only the runs of the current segment are held, and
+        sub segment words are read and unpacked only for the rows of the current batch.
+        """
+        pending = []
+        pending_size = 0
+        for runs, read_bitpacked in self._iter_segment_runs(read, segments, null_adjustment):
+            position = 0
+            while position < runs.row_count:
+                size = min(batch_size - pending_size, runs.row_count - position)
+                pending.append(runs.expand(position, position + size, read_bitpacked))
+                pending_size += size
+                position += size
+                if pending_size == batch_size:
+                    yield pending[0] if len(pending) == 1 else np.concatenate(pending)
+                    pending = []
+                    pending_size = 0
+        if pending:
+            yield np.concatenate(pending)
+
+    def _read_row_range(self, read, segments, start, stop=None, null_adjustment=0):
+        """
+        Reads the values of rows [start, stop) of an IDF as an int64 array, reading the file through
+        read(offset, length). Segments before the range are skipped by their idfmeta record counts after
+        reading their vector sizes, and reading stops at the first segment past it. Of the segments in
+        range only the runs in use and the sub segment words holding needed bitpacked values are read,
+        and runs past the end of the range are neither scanned nor expanded.
+        """
+        vectors = []
+        segment_start = 0
+        idf_segments = iter_idf(read)
+        for segment_meta in segments:
+            if stop is not None and segment_start >= stop:
+                break
+            segment = next(idf_segments, None)
+            if segment is None:
+                raise ValueError(f"IDF has fewer segments than the {len(segments)} its idfmeta describes.")
+            segment_end = segment_start + segment_meta['records']
+            if segment_end > start:
+                payload = self._segment_payload(segment, segment_meta, null_adjustment)
+                data_values, repeat_values, sub_segment, entries, min_data_id, bit_width = payload
+                bitpacked_count, read_bitpacked = self._bitpacked_reader(sub_segment, entries, min_data_id, bit_width)
+                local_start = max(start - segment_start, 0)
+                local_stop = segment_meta['records'] if stop is None else min(stop, segment_end) - segment_start
+                # Runs are only cut short, never lengthened, so the runs up to local_stop cover it unless one was cut
+                needed = int(np.searchsorted(np.cumsum(repeat_values, dtype=np.int64), local_stop)) + 1
+                runs = _SegmentRuns(data_values[:needed], repeat_values[:needed], bitpacked_count)
+                if runs.row_count < local_stop:
+                    runs = _SegmentRuns(data_values, repeat_values, bitpacked_count)
+                vectors.append(runs.expand(local_start, min(local_stop, runs.row_count), read_bitpacked))
+            segment_start = segment_end
+        return np.concatenate(vectors) if vectors else np.empty(0, dtype=np.int64)
+
+    def _read_rle_bit_packed_hybrid(self, buffer, segments, null_adjustment=0):
+        """
+        Reads RLE bit packed hybrid values from a buffer as an int64 array.
+        Every segment of the IDF is decoded with its own idfmeta segment and the results are concatenated in order.
+        """
+        payloads = self._segment_payloads(buffer, segments, null_adjustment)
+
+        # Segments are independent, decode them on the process pool when there are several
+        max_workers = resolve_workers(self._max_workers)
+        if max_workers > 1 and len(payloads) >= self.PARALLEL_MIN_SEGMENTS:
+            vectors = list(get_process_pool(max_workers).map(VertiPaqDecoder._decode_segment, *zip(*payloads)))
+        else:
+            vectors = [self._decode_segment(*payload) for payload in payloads]
+        return np.concatenate(vectors) if vectors else np.empty(0, dtype=np.int64)
 
     def _read_idfmeta(self,buffer):
-        """Reads idfmeta from a buffer."""
-        # Use io.BytesIO to wrap the bytearray
-        with io.BytesIO(buffer) as f:
-            metadata = IdfmetaParser.from_io(f)
-            
-            # Extract the necessary data from the Kaitai Struct
-            row_data = {
-                'min_data_id': metadata.blocks.cp.cs.ss.min_data_id,
-                'count_bit_packed': metadata.blocks.cp.cs.cs.count_bit_packed,
-                'bit_width': metadata.bit_width,
+        """
+        Reads idfmeta from a buffer: one entry per segment in `segments`, and the smallest
+        min_data_id of the column.
+        """
+        # Wrap the buffer in a stream without copying it
+        with open_buffer(buffer) as f:
+            stream = KaitaiStream(f)
+            cp_tag = stream.read_bytes(6)
+            if cp_tag != self.IDFMETA_CP_TAG:
+                raise ValueError(f"Invalid idfmeta, expected a column partition tag but found {cp_tag!r}.")
+            stream.read_u8le()  # version
+
+            # The column partition holds one column segment element per segment
+            segments = []
+            while True:
+                position = stream.pos()
+                tag = stream.read_bytes(6)
+                if tag == self.IDFMETA_CP_TAG_END:
+                    break
+                if tag != self.IDFMETA_CS_TAG:
+                    raise ValueError(f"Invalid idfmeta, expected a column segment tag but found {tag!r}.")
+                stream.seek(position)
+                cs = IdfmetaParser.CS0Element(stream)
+                segments.append({
+                    'records': cs.records,
+                    'min_data_id': cs.ss.min_data_id,
+                    'count_bit_packed': cs.cs.count_bit_packed,
+                    # Same as IdfmetaParser.bit_width
+                    'bit_width': (36 - cs.a_b_a_5_a) + cs.iterator,
+                    'runs': cs.ss.r_l_e_runs + cs.ss.others_r_l_e_runs,
+                })
+
+            return {
+                'min_data_id': min(segment['min_data_id'] for segment in segments),
+                'segments': segments,
             }
-            
-            return row_data
 
     def _read_hash_table(self,buffer):
         """Reads a hash table from a buffer."""
-        with io.BytesIO(buffer) as f:
+        with open_buffer(buffer) as f:
             # Parse the .hidx file using the Kaitai Struct
             parsed_hidx = ColumnDataHidx.from_io(f)
 
@@ -114,15 +445,38 @@ class VertiPaqDecoder:
             return result_hash_table
 
  
+    def _read_number_dictionary(self, buffer):
+        """
+        Reads the values of a long or real dictionary as a NumPy array viewing the buffer, without copying.
+        Returns None for other dictionary types.
+        """
+        dictionary_type, = struct.unpack_from('<i', buffer)
+        if dictionary_type not in (ColumnDataDictionary.DictionaryTypes.xm_type_long.value, ColumnDataDictionary.DictionaryTypes.xm_type_real.value):
+            return None
+        element_count, element_size = struct.unpack_from('<QI', buffer, self.NUMBER_DICTIONARY_HEADER_SIZE)
+        # Same element types as VectorOfVectors.data_type_id
+        if element_size == 4:
+            dtype = '<i4'
+        elif dictionary_type == ColumnDataDictionary.DictionaryTypes.xm_type_long.value:
+            dtype = '<i8'
+        else:
+            dtype = '<f8'
+        offset = self.NUMBER_DICTIONARY_HEADER_SIZE + 12
+        if offset + element_count * np.dtype(dtype).itemsize > len(buffer):
+            raise ValueError(f"Dictionary of {element_count} values is truncated.")
+        return np.frombuffer(buffer, dtype=dtype, count=element_count, offset=offset)
+
     def _read_dictionary(self, buffer, min_data_id):
         """Reads a dictionary from a buffer."""
-        with io.BytesIO(buffer) as f:
+        values = self._read_number_dictionary(buffer)
+        if values is not None:
+            # Dense array indexed by data_id - min_data_id
+            return values
+
+        with open_buffer(buffer) as f:
             dictionary = ColumnDataDictionary.from_io(f)
 
         if dictionary.dictionary_type == ColumnDataDictionary.DictionaryTypes.xm_type_string:
-            hashtable = {}
-            index = min_data_id
-
             pages = dictionary.data.dictionary_pages
             record_handles = dictionary.data.dictionary_record_handles_vector_info.vector_of_record_handle_structures
             record_handles_map = defaultdict(list)
@@ -130,84 +484,341 @@ class VertiPaqDecoder:
             for handle in record_handles:
                 record_handles_map[handle.page_id].append(handle.bit_or_byte_offset)
 
+            # Decode every page into a UTF-8 buffer plus offsets, strings are created on lookup
+            page_buffers = []
+            compressed_starts = []
+            compressed_pages = []
             for page_id, page in enumerate(pages):
                 if page.page_compressed:
+                    if page_id not in record_handles_map:
+                        continue
                     compressed_store = page.string_store
-                    encode_array = compressed_store.encode_array
-                    store_total_bits = compressed_store.store_total_bits
-                    compressed_string_buffer = compressed_store.compressed_string_buffer
-                    ui_decode_bits = compressed_store.ui_decode_bits
-
-                    full_encode_array = decompress_encode_array(encode_array)
-                    huffman_tree = build_huffman_tree(full_encode_array)
-
-                    if page_id in record_handles_map:
-                        offsets = record_handles_map[page_id]
-                        for i in range(len(offsets)):
-                            start_bit = offsets[i]
-                            end_bit = offsets[i + 1] if i + 1 < len(offsets) else store_total_bits
-                            decompressed = decode_substring(compressed_string_buffer, huffman_tree, start_bit, end_bit)
-                            hashtable[index] = decompressed
-                            index += 1
-                    del huffman_tree
+                    compressed_starts.append(page.page_start_index)
+                    compressed_pages.append((bytes(compressed_store.encode_array), compressed_store.compressed_string_buffer,
+                                             record_handles_map[page_id], compressed_store.store_total_bits))
                 else:
-                    uncompressed_store = page.string_store
-                    uncompressed = uncompressed_store.uncompressed_character_buffer
-                    strings = self._extract_strings(uncompressed)
-                    for i, token in enumerate(strings):
-                        hashtable[index] = token
-                        index += 1
-
-            return hashtable
-        elif dictionary.dictionary_type in [ColumnDataDictionary.DictionaryTypes.xm_type_long, ColumnDataDictionary.DictionaryTypes.xm_type_real]:
-            vector_values = dictionary.data.vector_of_vectors_info.values
-            return {i: val for i, val in enumerate(vector_values, start=min_data_id)}
+                    page_buffers.append((page.page_start_index, zero_terminated_page(page.string_store.uncompressed_character_buffer)))
+
+            # Pages are independent, decode the compressed ones on the process pool when there are several
+            max_workers = resolve_workers(self._max_workers)
+            if max_workers > 1 and len(compressed_pages) >= self.PARALLEL_MIN_PAGES:
+                chunksize = max(1, len(compressed_pages) // (max_workers * 4))
+                decoded_pages = get_process_pool(max_workers).map(decode_compressed_page, *zip(*compressed_pages), chunksize=chunksize)
+            else:
+                decoded_pages = (decode_compressed_page(*compressed_page) for compressed_page in compressed_pages)
+            page_buffers.extend(zip(compressed_starts, decoded_pages))
+
+            # Merge the pages in the order of their first string
+            page_buffers.sort(key=lambda page_buffer: page_buffer[0])
+            return StringDictionary.from_pages([page_buffer for _, page_buffer in page_buffers], min_data_id)
 
         return None    
-        
-    def _get_column_data(self, column_metadata, meta):
-        """Extracts column data based on the given column metadata and meta information."""
+
+    def _dictionary_codes(self, data_ids, min_data_id, dictionary_size):
+        """
+        Turns data ids into positions in a dense dictionary. Ids outside the dictionary,
+        such as the null id below min_data_id of nullable columns, become -1.
+        """
+        codes = np.asarray(data_ids, dtype=np.int64) - min_data_id
+        codes[(codes < 0) | (codes >= dictionary_size)] = -1
+        return codes
+
+    def _get_value_converter(self, column_metadata, meta, categorical=False):
+        """
+        Returns a function converting data ids of a column to a pd.Series of its values, the null
+        adjustment of its data ids and the dictionary size (None for hidx encoded columns).
+        Dictionaries are read once and shared by every call.
+        Dictionary encoded columns become a pd.Categorical when `categorical` is set.
+        """
         if pd.notnull(column_metadata["Dictionary"]):
-            dictionary_buffer = get_data_slice(self._data_model,column_metadata["Dictionary"])
+            dictionary_buffer = get_data_view(self._data_model,column_metadata["Dictionary"], self._max_workers)
             null_adjustment = 1 if column_metadata["IsNullable"] else 0
             # Read and construct the dictionary with appropriate minimum data ID
-            min_data_id_adj = meta['min_data_id'] - null_adjustment
             dictionary = self._read_dictionary(dictionary_buffer, min_data_id=meta['min_data_id'])
-            data_slice = get_data_slice(self._data_model,column_metadata["IDF"])
-            return pd.Series(self._read_rle_bit_packed_hybrid(data_slice, meta['count_bit_packed'], min_data_id_adj , meta['bit_width'])).map(dictionary)
+            if dictionary is None:
+                raise ValueError(f"Unsupported dictionary type for column {column_metadata['ColumnName']} in table.")
+            values = dictionary.to_numpy() if isinstance(dictionary, StringDictionary) else dictionary
+            if categorical:
+                # Categories have to be unique and non-null, factorize the dictionary values onto them
+                value_codes, categories = pd.factorize(values)
+                def convert(data_ids):
+                    codes = self._dictionary_codes(data_ids, meta['min_data_id'], len(values))
+                    codes = np.where(codes >= 0, value_codes[codes], -1)
+                    return pd.Series(pd.Categorical.from_codes(codes, categories))
+            else:
+                def convert(data_ids):
+                    codes = self._dictionary_codes(data_ids, meta['min_data_id'], len(values))
+                    # Null codes are filled with NaN, like a lookup of a missing key
+                    return pd.Series(take(values, codes, allow_fill=True))
+            return convert, null_adjustment, len(values)
         elif pd.notnull(column_metadata["HIDX"]):
-            data_slice = get_data_slice(self._data_model,column_metadata["IDF"])
-            return pd.Series(self._read_rle_bit_packed_hybrid(data_slice, meta['count_bit_packed'], meta['min_data_id'], meta['bit_width'])).add(column_metadata["BaseId"]) / column_metadata["Magnitude"]
+            return lambda data_ids: pd.Series(data_ids).add(column_metadata["BaseId"]) / column_metadata["Magnitude"], 0, None
         else:
             raise ValueError(f"Neither dictionary nor hidx found for column {column_metadata['ColumnName']} in table.")
+
+    def _get_column_data(self, column_metadata, meta, categorical=False, start=0, stop=None):
+        """
+        Extracts column data based on the given column metadata and meta information,
+        restricted to rows [start, stop) if given.
+        """
+        convert, null_adjustment, _ = self._get_value_converter(column_metadata, meta, categorical)
+        if start == 0 and stop is None:
+            data_slice = get_data_view(self._data_model,column_metadata["IDF"], self._max_workers)
+            return convert(self._read_rle_bit_packed_hybrid(data_slice, meta['segments'], null_adjustment))
+        return convert(self._read_row_range(self._idf_reader(column_metadata), meta['segments'], start, stop, null_adjustment))
+
+    def _idf_reader(self, column_metadata):
+        """
+        Returns a read(offset, length) function over the IDF of a column. Ranged reads only decompress
+        the Xpress8 chunks (or read the parts of a lazy model) they cover.
+        """
+        return lambda offset, length: get_data_view(self._data_model, column_metadata["IDF"], offset=offset, length=length)
         
     def _handle_special_cases(self, column_data, data_type):
         if data_type == 9:
             # Convert to datetime
-            return pd.to_datetime(column_data, unit='d', origin='1899-12-30')
+            return pd.to_datetime(column_data, unit='D', origin='1899-12-30')
         elif data_type == 10:
             # Handle decimal.Decimal type
             return column_data.apply(lambda x: Decimal(x)/10000 if pd.notnull(x) else None)
         return column_data
         
-    def get_table(self, table_name):
-        """Generates a DataFrame representation of the specified table."""
+    def _get_table_metadata(self, table_name, columns=None):
+        """
+        Returns the schema rows of a table's columns, restricted to and ordered like `columns` if given.
+        A single column name may be given as a string.
+        Raises a ValueError naming any requested columns the table does not have.
+        """
         table_metadata_df = self._meta.schema_df[self._meta.schema_df['TableName'] == table_name]
+        if columns is None:
+            return table_metadata_df
+        if isinstance(columns, str):
+            columns = [columns]
+
+        columns = list(dict.fromkeys(columns))
+        missing = [column for column in columns if column not in set(table_metadata_df['ColumnName'])]
+        if missing:
+            raise ValueError(f"Columns {missing} not found in table '{table_name}'. "
+                             f"Available columns: {table_metadata_df['ColumnName'].tolist()}")
+        return table_metadata_df.set_index('ColumnName', drop=False).loc[columns]
+
+    def _convert_column(self, column_data, column_metadata):
+        """Converts decoded column values to the pandas dtype of the column; categoricals are kept as they are."""
+        if isinstance(column_data.dtype, pd.CategoricalDtype):
+            return column_data
+        # Handle special cases for certain data types
+        column_data = self._handle_special_cases(column_data, column_metadata["DataType"])
+        
+        pandas_dtype = AMO_PANDAS_TYPE_MAPPING.get(column_metadata["DataType"], "object")  # default to object if no mapping is found
+        
+        # If it's a decimal type, keep it as object since pandas doesn't support Decimal natively
+        if pandas_dtype == 'decimal.Decimal':
+            pandas_dtype = 'object'
+        return column_data.astype(pandas_dtype)
+
+    def _decode_column(self, column_metadata, categorical=False, start=0, stop=None):
+        """Reads, decodes and converts a single column, or its rows [start, stop), to its pandas dtype."""
+        idfmeta_buffer = get_data_view(self._data_model,column_metadata["IDF"] + 'meta')
+        meta = self._read_idfmeta(idfmeta_buffer)
+        # Only string columns are made categorical
+        column_data = self._get_column_data(column_metadata, meta, categorical and column_metadata["DataType"] == 2, start, stop)
+        return self._convert_column(column_data, column_metadata)
+
+    def _read_column_runs(self, column_metadata, categorical=False):
+        """Returns the value converter, dictionary size and IDF segment runs of a column, without expanding them."""
+        idfmeta_buffer = get_data_view(self._data_model,column_metadata["IDF"] + 'meta')
+        meta = self._read_idfmeta(idfmeta_buffer)
+        convert, null_adjustment, dictionary_size = self._get_value_converter(column_metadata, meta, categorical)
+        data_slice = get_data_view(self._data_model,column_metadata["IDF"], self._max_workers)
+        return meta, convert, dictionary_size, self._read_segment_runs(data_slice, meta['segments'], null_adjustment)
+
+    def _match_values(self, values, operator, value):
+        """Evaluates a filter on converted column values as a boolean array; null values never match."""
+        matches = self.FILTER_OPERATORS[operator](values, value)
+        return (matches & values.notna()).to_numpy(dtype=bool)
+
+    def _get_row_predicate(self, column_metadata, meta, convert, dictionary_size, operator, value):
+        """
+        Returns a function testing data ids of a column against a filter. Dictionary encoded columns
+        evaluate the filter once per dictionary value, so data ids are only looked up.
+        """
+        if dictionary_size is None:
+            return lambda data_ids: self._match_values(self._convert_column(convert(data_ids), column_metadata), operator, value)
+
+        dictionary_ids = np.arange(meta['min_data_id'], meta['min_data_id'] + dictionary_size)
+        matches = self._match_values(self._convert_column(convert(dictionary_ids), column_metadata), operator, value)
+        # Ids outside the dictionary get code -1, which looks up the trailing False
+        matches = np.append(matches, False)
+        return lambda data_ids: matches[self._dictionary_codes(data_ids, meta['min_data_id'], dictionary_size)]
+
+    def _validate_filters(self, filters):
+        """
+        Raises a ValueError for filters with an unsupported operator or a null value. Null values never
+        match a filter, so comparing with None (or a list containing it) would silently select nothing.
+        """
+        for column, operator, value in filters:
+            if operator not in self.FILTER_OPERATORS:
+                raise ValueError(f"Unsupported filter operator {operator!r}. "
+                                 f"Supported operators: {list(self.FILTER_OPERATORS)}")
+            if operator in ('in', 'not in'):
+                if isinstance(value, str) or not pd.api.types.is_list_like(value):
+                    raise ValueError(f"Filter {operator!r} on column {column} needs a list of values, got {value!r}.")
+                values = list(value)
+            else:
+                values = [value]
+            if any(pd.api.types.is_scalar(v) and pd.isna(v) for v in values):
+                raise ValueError(f"Filter on column {column} compares with a null value; null values never match filters.")
+
+    def _get_filtered_rows(self, table_name, filters):
+        """Returns the sorted positions of the rows of a table matching all (column, operator, value) filters."""
+        filter_metadata_df = self._get_table_metadata(table_name, [column for column, _, _ in filters])
+
+        rows = None
+        for column, operator, value in filters:
+            column_metadata = filter_metadata_df.loc[column]
+            meta, convert, dictionary_size, segment_runs = self._read_column_runs(column_metadata)
+            predicate = self._get_row_predicate(column_metadata, meta, convert, dictionary_size, operator, value)
+            matches = self._mask_rle_bit_packed_hybrid(segment_runs, predicate)
+            rows = matches if rows is None else rows & matches
+        return np.flatnonzero(rows)
+
+    def get_table(self, table_name, columns=None, categorical=False, filters=None, limit=None, offset=0):
+        """
+        Generates a DataFrame representation of the specified table.
+        With `columns` only those columns are read and decoded, in the given order.
+        With `categorical` set, string columns are returned as pd.Categorical columns built
+        from the dictionary codes instead of object columns of repeated strings.
+        With `filters`, a list of (column, operator, value) tuples, only the rows matching all of
+        them are decoded, indexed by their row number. Operators are those of FILTER_OPERATORS.
+        With `limit` and `offset` only up to `limit` rows starting at row `offset` (of the filtered rows,
+        with `filters`) are decoded, indexed by their row number; decoding stops once they are read.
+        """
+        if offset < 0 or (limit is not None and limit < 0):
+            raise ValueError(f"limit and offset must not be negative, got limit={limit} and offset={offset}.")
+        if filters:
+            self._validate_filters(filters)
+        table_metadata_df = self._get_table_metadata(table_name, columns)
+        stop = None if limit is None else offset + limit
+        if filters:
+            return self._get_filtered_table(table_name, table_metadata_df, filters, categorical, offset, stop)
         dataframe_data = {}
 
         for _, column_metadata in table_metadata_df.iterrows():
-            idfmeta_buffer = get_data_slice(self._data_model,column_metadata["IDF"] + 'meta')
+            dataframe_data[column_metadata["ColumnName"]] = self._decode_column(column_metadata, categorical, offset, stop)
+
+        table_df = pd.DataFrame(dataframe_data)
+        if offset:
+            table_df.index = pd.RangeIndex(offset, offset + len(table_df))
+        return table_df
+
+    def _get_filtered_table(self, table_name, table_metadata_df, filters, categorical=False, start=0, stop=None):
+        """Decodes the columns of a table at the rows matching the filters only, or the matches [start, stop) of them."""
+        rows = self._get_filtered_rows(table_name, filters)[start:stop]
+        dataframe_data = {}
+
+        for _, column_metadata in table_metadata_df.iterrows():
+            _, convert, _, segment_runs = self._read_column_runs(column_metadata, categorical and column_metadata["DataType"] == 2)
+            column_data = convert(self._take_rle_bit_packed_hybrid(segment_runs, rows))
+            dataframe_data[column_metadata["ColumnName"]] = self._convert_column(column_data, column_metadata)
+
+        table_df = pd.DataFrame(dataframe_data)
+        table_df.index = pd.Index(rows)
+        return table_df
+
+    def _read_column_intervals(self, column_metadata):
+        """Returns the value converter and the intervals of equal data ids of a column."""
+        _, convert, _, segment_runs = self._read_column_runs(column_metadata)
+        return convert, self._read_intervals(segment_runs)
+
+    def aggregate(self, table_name, column, ops, group_by=None):
+        """
+        Computes aggregates of a column without materializing its rows, like Series.agg(ops) or, with
+        `group_by`, DataFrame.groupby(group_by)[column].agg(ops). Rows are counted per distinct data id
+        over the RLE runs and bitpacked values, and data ids are mapped to values only at the end.
+        Operations are those of AGGREGATE_OPERATIONS.
+        """
+        ops = list(ops)
+        unsupported = [op for op in ops if op not in self.AGGREGATE_OPERATIONS]
+        if not ops or unsupported:
+            raise ValueError(f"Unsupported aggregate operations {unsupported}. "
+                             f"Supported operations: {list(self.AGGREGATE_OPERATIONS)}")
+        table_metadata_df = self._get_table_metadata(table_name, [column] if group_by is None else [column, group_by])
+
+        column_metadata = table_metadata_df.loc[column]
+        with_total = any(op in self.TOTAL_OPERATIONS for op in ops)
+        if with_total and column_metadata["DataType"] not in self.NUMERIC_DATA_TYPES:
+            raise ValueError(f"Operations {list(self.TOTAL_OPERATIONS)} need a numeric column, column {column} "
+                             f"of table '{table_name}' is {AMO_PANDAS_TYPE_MAPPING.get(column_metadata['DataType'], 'object')}.")
+        convert, (data_ids, ends) = self._read_column_intervals(column_metadata)
+        if group_by is None:
+            distinct_ids, rows = self._count_distinct(data_ids, np.diff(ends, prepend=0))
+        else:
+            group_metadata = table_metadata_df.loc[group_by]
+            group_convert, (group_ids, group_ends) = self._read_column_intervals(group_metadata)
+            if ends[-1:].tolist() != group_ends[-1:].tolist():
+                raise ValueError(f"Columns {column} and {group_by} of table '{table_name}' have different row counts.")
+            # Intervals of both columns split at each other's ends hold a single (group, value) pair
+            pair_ends = np.union1d(ends, group_ends)
+            pairs = np.stack([group_ids[np.searchsorted(group_ends, pair_ends)], data_ids[np.searchsorted(ends, pair_ends)]])
+            (distinct_group_ids, distinct_ids), rows = self._count_distinct(pairs, np.diff(pair_ends, prepend=0))
+
+        values = self._convert_column(convert(distinct_ids), column_metadata).reset_index(drop=True)
+        data = pd.DataFrame({'value': values, 'rows': np.where(values.notna(), rows, 0)})
+        if with_total:
+            data['total'] = data['value'] * data['rows']
+        if group_by is None:
+            return pd.Series({op: self.AGGREGATE_OPERATIONS[op](data) for op in ops}, name=column)
+
+        # The group keys are kept apart from the frame, so a group column named like its columns cannot replace them
+        group_keys = self._convert_column(group_convert(distinct_group_ids), group_metadata).reset_index(drop=True)
+        grouped = data.groupby(group_keys.rename(group_by))
+        return pd.DataFrame({op: self.AGGREGATE_OPERATIONS[op](grouped) for op in ops})
+
+    def value_counts(self, table_name, column):
+        """
+        Counts the rows holding each non-null value of a column, like Series.value_counts(),
+        from the RLE runs and bitpacked values without materializing the rows.
+        """
+        column_metadata = self._get_table_metadata(table_name, [column]).loc[column]
+        convert, (data_ids, ends) = self._read_column_intervals(column_metadata)
+        distinct_ids, rows = self._count_distinct(data_ids, np.diff(ends, prepend=0))
+
+        values = self._convert_column(convert(distinct_ids), column_metadata)
+        # Binary columns hold fixed width bytes, which an Index cannot hold, so values are indexed as objects
+        counts = pd.Series(rows, index=pd.Index(values.astype(object), name=column), name='count')
+        counts = counts[counts.index.notna()]
+        # Distinct data ids may convert to the same value, such as blank and null strings
+        counts = counts.groupby(level=0, sort=False).sum()
+        return counts.sort_values(ascending=False, kind='stable')
+
+    def iter_table(self, table_name, batch_size=DEFAULT_BATCH_SIZE, columns=None, categorical=False):
+        """
+        Yields the specified table as DataFrames of up to `batch_size` aligned rows, indexed by row number.
+        IDF files are read range by range, so besides the current batch only the dictionaries and the
+        runs of the current segment of each column are held in memory; `columns` and `categorical` work
+        as in get_table.
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}.")
+        table_metadata_df = self._get_table_metadata(table_name, columns)
+
+        column_readers = []
+        for _, column_metadata in table_metadata_df.iterrows():
+            idfmeta_buffer = get_data_view(self._data_model,column_metadata["IDF"] + 'meta')
             meta = self._read_idfmeta(idfmeta_buffer)
-            
-            column_data = self._get_column_data(column_metadata, meta)
-            # Handle special cases for certain data types
-            column_data = self._handle_special_cases(column_data, column_metadata["DataType"])
-            
-            pandas_dtype = AMO_PANDAS_TYPE_MAPPING.get(column_metadata["DataType"], "object")  # default to object if no mapping is found
-            
-            # If it's a decimal type, keep it as object since pandas doesn't support Decimal natively
-            if pandas_dtype == 'decimal.Decimal':
-                pandas_dtype = 'object'
-            dataframe_data[column_metadata["ColumnName"]] = column_data.astype(pandas_dtype)
+            convert, null_adjustment, _ = self._get_value_converter(column_metadata, meta, categorical and column_metadata["DataType"] == 2)
+            data_ids = self._iter_rle_bit_packed_hybrid(self._idf_reader(column_metadata), meta['segments'], batch_size, null_adjustment)
+            column_readers.append((column_metadata, convert, data_ids))
 
-        return pd.DataFrame(dataframe_data)
\ No newline at end of file
+        row = 0
+        while column_readers:
+            dataframe_data = {}
+            for column_metadata, convert, data_ids in column_readers:
+                batch = next(data_ids, None)
+                if batch is None:
+                    return
+                dataframe_data[column_metadata["ColumnName"]] = self._convert_column(convert(batch), column_metadata)
+            batch_df = pd.DataFrame(dataframe_data)
+            batch_df.index = pd.RangeIndex(row, row + len(batch_df))
+            row += len(batch_df)
+            yield batch_df
@@ -1,159 +1,227 @@
-class Xpress8:
-    """
-    Class for decompressing data using the Xpress8 compression algorithm.
-    Provides methods for single buffer decompression and chunked data decompression.
-    """
-    
-    @staticmethod
-    def decompress(input_buffer, output_buffer_size):
-        """
-        Decompress a single compressed buffer using the Xpress8 algorithm.
-        
-        Args:
-            input_buffer (bytes or bytearray): The compressed input data.
-            output_buffer_size (int): The expected size of the decompressed data.
-            
-        Returns:
-            bytearray: The decompressed data.
-        """
-        if not input_buffer:
-            return bytearray()
-        
-        output_buffer = bytearray(output_buffer_size)
-        
-        kind_bit = 0  # Current bit position in the Kind value
-        have_nibble = False  # Whether we have a pending nibble from a previous read
-        output_buffer_index = 0  # Current position in the output buffer
-        input_buffer_index = 0  # Current position in the input buffer
-        nibble_value = 0  # Value of the pending nibble
-        kind = 0  # Current Kind value (flags for whether bytes are literal or sequences)
-        
-        while output_buffer_index < output_buffer_size:
-            # If we've used all bits in Kind, read a new 32-bit Kind value
-            if kind_bit == 0:
-                if input_buffer_index + 3 >= len(input_buffer):
-                    break  # Not enough data left to read a new Kind value
-                
-                kind = (input_buffer[input_buffer_index] | 
-                       (input_buffer[input_buffer_index + 1] << 8) | 
-                       (input_buffer[input_buffer_index + 2] << 16) | 
-                       (input_buffer[input_buffer_index + 3] << 24))
-                input_buffer_index += 4
-                kind_bit = 32
-            
-            kind_bit -= 1
-            
-            # Check the current bit in Kind to determine if we're copying a literal byte or a sequence
-            if (kind & (1 << kind_bit)) == 0:
-                # Copy a literal byte
-                if input_buffer_index >= len(input_buffer):
-                    break  # Not enough data left to read a literal byte
-                
-                output_buffer[output_buffer_index] = input_buffer[input_buffer_index]
-                input_buffer_index += 1
-                output_buffer_index += 1
-            else:
-                # Copy a sequence
-                if input_buffer_index + 1 >= len(input_buffer):
-                    break  # Not enough data left to read the length_offset
-                
-                length_offset = input_buffer[input_buffer_index] | (input_buffer[input_buffer_index + 1] << 8)
-                input_buffer_index += 2
-                
-                offset = length_offset >> 3
-                length = length_offset & 7
-                
-                if length == 7:
-                    if not have_nibble:
-                        if input_buffer_index >= len(input_buffer):
-                            break  # Not enough data left to read a nibble
-                        
-                        have_nibble = True
-                        nibble_value = input_buffer[input_buffer_index]
-                        length = nibble_value & 15
-                        input_buffer_index += 1
-                    else:
-                        length = nibble_value >> 4
-                        have_nibble = False
-                    
-                    if length == 15:
-                        if input_buffer_index >= len(input_buffer):
-                            break  # Not enough data left to read the extended length
-                        
-                        length = input_buffer[input_buffer_index]
-                        input_buffer_index += 1
-                        
-                        if length == 255:
-                            if input_buffer_index + 1 >= len(input_buffer):
-                                break  # Not enough data left to read the 16-bit extended length
-                            
-                            length = input_buffer[input_buffer_index] | (input_buffer[input_buffer_index + 1] << 8)
-                            input_buffer_index += 2
-                            length -= 22
-                        
-                        length += 15
-                    
-                    length += 7
-                
-                length += 3
-                
-                # Check if offset is valid
-                if offset + 1 > output_buffer_index:
-                    break  # Invalid offset (would read before the start of the output buffer)
-                
-                # Copy the sequence, handling overlap
-                for i in range(length):
-                    if output_buffer_index >= output_buffer_size:
-                        break  # Output buffer is full
-                    
-                    output_buffer[output_buffer_index] = output_buffer[output_buffer_index - offset - 1]
-                    output_buffer_index += 1
-        
-        return output_buffer
-
-    @staticmethod
-    def decompress_chunked(input_buffer):
-        """
-        Decompress a buffer containing multiple compressed chunks.
-        Each chunk starts with a 4-byte header:
-        - First 2 bytes (uint16): Size of the uncompressed chunk
-        - Next 2 bytes (uint16): Size of the compressed chunk
-        
-        Args:
-            input_buffer (bytes or bytearray): The compressed input data with chunk headers
-            
-        Returns:
-            bytearray: The fully decompressed data from all chunks
-        """
-        if not input_buffer:
-            return bytearray()
-        
-        output_buffer = bytearray()
-        input_buffer_index = 0
-        
-        # Process all chunks until end of buffer
-        while input_buffer_index < len(input_buffer):
-            # Ensure we have enough data for the chunk header (4 bytes)
-            if input_buffer_index + 4 > len(input_buffer):
-                break
-            
-            # Extract uncompressed and compressed sizes from header (little-endian 2-byte integers)
-            uncompressed_size = input_buffer[input_buffer_index] | (input_buffer[input_buffer_index + 1] << 8)
-            input_buffer_index += 2
-            
-            compressed_size = input_buffer[input_buffer_index] | (input_buffer[input_buffer_index + 1] << 8)
-            input_buffer_index += 2
-            
-            # Check if we have enough data for the compressed chunk
-            if input_buffer_index + compressed_size > len(input_buffer):
-                break
-            
-            # Extract the compressed chunk
-            compressed_chunk = input_buffer[input_buffer_index:input_buffer_index + compressed_size]
-            input_buffer_index += compressed_size
-            
-            # Decompress the chunk and append to the output buffer
-            decompressed_chunk = Xpress8.decompress(compressed_chunk, uncompressed_size)
-            output_buffer.extend(decompressed_chunk)
-        
-        return output_buffer
\ No newline at end of file
+from .parallel import get_process_pool, resolve_workers, split_batches
+
+
+class Xpress8:
+    """
+    Class for decompressing data using the Xpress8 compression algorithm.
+    Provides methods for single buffer decompression and chunked data decompression.
+    """
+    # Chunked buffers with fewer chunks are not worth shipping to worker processes
+    PARALLEL_MIN_CHUNKS = 16
+    
+    @staticmethod
+    def decompress(input_buffer, output_buffer_size):
+        """
+        Decompress a single compressed buffer using the Xpress8 algorithm.
+
+        Runs of literal bytes are copied as one slice, non-overlapping matches are copied
+        with slice assignment and overlapping (short offset) matches by repeating the
+        period, instead of copying one byte per iteration.
+        
+        Args:
+            input_buffer (bytes, bytearray or memoryview): The compressed input data.
+            output_buffer_size (int): The expected size of the decompressed data.
+            
+        Returns:
+            bytearray: The decompressed data.
+        """
+        if not input_buffer:
+            return bytearray()
+        
+        if isinstance(input_buffer, memoryview):
+            input_buffer = input_buffer.tobytes()  # indexing bytes is considerably faster
+        output_buffer = bytearray(output_buffer_size)
+        input_buffer_length = len(input_buffer)
+        
+        kind_bit = 0  # Number of unused bits left in the Kind value
+        have_nibble = False  # Whether we have a pending nibble from a previous read
+        output_buffer_index = 0  # Current position in the output buffer
+        input_buffer_index = 0  # Current position in the input buffer
+        nibble_value = 0  # Value of the pending nibble
+        kind = 0  # Current Kind value (flags for whether bytes are literal or sequences)
+        
+        while output_buffer_index < output_buffer_size:
+            # If we've used all bits in Kind, read a new 32-bit Kind value
+            if kind_bit == 0:
+                if input_buffer_index + 3 >= input_buffer_length:
+                    break  # Not enough data left to read a new Kind value
+                
+                kind = (input_buffer[input_buffer_index] | 
+                       (input_buffer[input_buffer_index + 1] << 8) | 
+                       (input_buffer[input_buffer_index + 2] << 16) | 
+                       (input_buffer[input_buffer_index + 3] << 24))
+                input_buffer_index += 4
+                kind_bit = 32
+            
+            # Zero bits below the current position are literals; count them up to the next sequence bit
+            remaining_kind = kind & ((1 << kind_bit) - 1)
+            literal_count = kind_bit - remaining_kind.bit_length()
+            
+            if literal_count:
+                # Copy a run of literal bytes, bounded by the input and output left
+                count = literal_count
+                if output_buffer_index + count > output_buffer_size:
+                    count = output_buffer_size - output_buffer_index
+                if input_buffer_index + count > input_buffer_length:
+                    count = input_buffer_length - input_buffer_index
+                output_buffer[output_buffer_index:output_buffer_index + count] = \
+                    input_buffer[input_buffer_index:input_buffer_index + count]
+                input_buffer_index += count
+                output_buffer_index += count
+                kind_bit -= count
+                if count < literal_count and output_buffer_index < output_buffer_size:
+                    break  # Not enough data left to read a literal byte
+                continue
+            
+            # Copy a sequence
+            kind_bit -= 1
+            if input_buffer_index + 1 >= input_buffer_length:
+                break  # Not enough data left to read the length_offset
+            
+            length_offset = input_buffer[input_buffer_index] | (input_buffer[input_buffer_index + 1] << 8)
+            input_buffer_index += 2
+            
+            offset = length_offset >> 3
+            length = length_offset & 7
+            
+            if length == 7:
+                if not have_nibble:
+                    if input_buffer_index >= input_buffer_length:
+                        break  # Not enough data left to read a nibble
+                    
+                    have_nibble = True
+                    nibble_value = input_buffer[input_buffer_index]
+                    length = nibble_value & 15
+                    input_buffer_index += 1
+                else:
+                    length = nibble_value >> 4
+                    have_nibble = False
+                
+                if length == 15:
+                    if input_buffer_index >= input_buffer_length:
+                        break  # Not enough data left to read the extended length
+                    
+                    length = input_buffer[input_buffer_index]
+                    input_buffer_index += 1
+                    
+                    if length == 255:
+                        if input_buffer_index + 1 >= input_buffer_length:
+                            break  # Not enough data left to read the 16-bit extended length
+                        
+                        length = input_buffer[input_buffer_index] | (input_buffer[input_buffer_index + 1] << 8)
+                        input_buffer_index += 2
+                        length -= 22
+                    
+                    length += 15
+                
+                length += 7
+            
+            length += 3
+            
+            # Check if offset is valid
+            distance = offset + 1
+            if distance > output_buffer_index:
+                break  # Invalid offset (would read before the start of the output buffer)
+            
+            # Copy the sequence, truncated at the end of the output buffer
+            if output_buffer_index + length > output_buffer_size:
+                length = output_buffer_size - output_buffer_index
+            source_index = output_buffer_index - distance
+            if distance >= length:
+                output_buffer[output_buffer_index:output_buffer_index + length] = \
+                    output_buffer[source_index:source_index + length]
+            else:
+                # Overlapping copy, the last `distance` bytes repeat until the sequence is complete
+                period = output_buffer[source_index:output_buffer_index]
+                output_buffer[output_buffer_index:output_buffer_index + length] = \
+                    (period * (length // distance + 1))[:length]
+            output_buffer_index += length
+        
+        return output_buffer
+
+    @staticmethod
+    def read_chunk_table(input_buffer):
+        """
+        Scans the chunk headers of a chunked buffer.
+        Each chunk starts with a 4-byte header:
+        - First 2 bytes (uint16): Size of the uncompressed chunk
+        - Next 2 bytes (uint16): Size of the compressed chunk
+        
+        Args:
+            input_buffer (bytes, bytearray or memoryview): The compressed input data with chunk headers
+            
+        Returns:
+            list: (input_offset, compressed_size, output_offset, uncompressed_size) of every complete chunk
+        """
+        chunk_table = []
+        input_buffer_index = 0
+        output_buffer_index = 0
+        input_buffer_length = len(input_buffer)
+        
+        # Process all chunks until end of buffer
+        while input_buffer_index + 4 <= input_buffer_length:
+            # Extract uncompressed and compressed sizes from header (little-endian 2-byte integers)
+            uncompressed_size = input_buffer[input_buffer_index] | (input_buffer[input_buffer_index + 1] << 8)
+            compressed_size = input_buffer[input_buffer_index + 2] | (input_buffer[input_buffer_index + 3] << 8)
+            input_buffer_index += 4
+            
+            # Check if we have enough data for the compressed chunk
+            if input_buffer_index + compressed_size > input_buffer_length:
+                break
+            
+            # An empty chunk decompresses to nothing, whatever its header says
+            if compressed_size == 0:
+                uncompressed_size = 0
+            
+            chunk_table.append((input_buffer_index, compressed_size, output_buffer_index, uncompressed_size))
+            input_buffer_index += compressed_size
+            output_buffer_index += uncompressed_size
+        
+        return chunk_table
+
+    @staticmethod
+    def decompress_chunked(input_buffer, max_workers=1):
+        """
+        Decompress a buffer containing multiple compressed chunks.
+        The chunk headers are scanned first to preallocate the output; chunks are independent,
+        so with several workers they are decoded in parallel on a process pool.
+        
+        Args:
+            input_buffer (bytes, bytearray or memoryview): The compressed input data with chunk headers
+            max_workers (int, optional): Number of worker processes, None for one per CPU.
+                Small buffers are always decoded in this process.
+            
+        Returns:
+            bytearray: The fully decompressed data from all chunks
+        """
+        if not input_buffer:
+            return bytearray()
+        
+        chunk_table = Xpress8.read_chunk_table(input_buffer)
+        if not chunk_table:
+            return bytearray()
+        
+        _, _, last_output_offset, last_uncompressed_size = chunk_table[-1]
+        output_buffer = bytearray(last_output_offset + last_uncompressed_size)
+        
+        max_workers = resolve_workers(max_workers)
+        if max_workers > 1 and len(chunk_table) >= Xpress8.PARALLEL_MIN_CHUNKS:
+            # Ship batches of chunks to the workers and copy each result to its place in the output
+            batches = split_batches(chunk_table, max_workers * 4)
+            payloads = [[(bytes(input_buffer[offset:offset + size]), uncompressed_size)
+                         for offset, size, _, uncompressed_size in batch] for batch in batches]
+            pool = get_process_pool(max_workers)
+            for batch, decompressed_batch in zip(batches, pool.map(_decompress_chunks, payloads)):
+                start = batch[0][2]
+                output_buffer[start:start + len(decompressed_batch)] = decompressed_batch
+        else:
+            for offset, size, output_offset, uncompressed_size in chunk_table:
+                output_buffer[output_offset:output_offset + uncompressed_size] = \
+                    Xpress8.decompress(input_buffer[offset:offset + size], uncompressed_size)
+        
+        return output_buffer
+
+
+def _decompress_chunks(chunks):
+    """Worker entry point: decompresses a batch of consecutive chunks into one buffer."""
+    return b''.join(Xpress8.decompress(chunk, uncompressed_size) for chunk, uncompressed_size in chunks)
@@ -0,0 +1,133 @@
+import threading
+import zipfile
+from dataclasses import dataclass, field
+from xpress9 import Xpress9
+
+
+def compress_session(image, chunk_size):
+    """
+    Encodes an image as the frames of one Xpress9 session, each a uint32 uncompressed size,
+    a uint32 compressed size and the compressed chunk. Used to build backups for tests and benchmarks.
+    """
+    encoder = Xpress9()
+    frames = bytearray()
+    for start in range(0, len(image), chunk_size):
+        chunk = image[start:start + chunk_size]
+        compressed = encoder.compress(chunk, len(chunk) + 1024)
+        frames += len(chunk).to_bytes(4, 'little') + len(compressed).to_bytes(4, 'little') + compressed
+    return frames
+
+
+@dataclass
+class Xpress9Chunk:
+    compressed_offset: int  # offset of the payload within the DataModel zip entry
+    compressed_size: int
+    uncompressed_offset: int  # offset of the chunk within the decompressed ABF image
+    uncompressed_size: int
+
+
+@dataclass
+class Xpress9Session:
+    """
+    A run of chunks that has to be decoded in order by a single Xpress9 instance.
+    Single-threaded backups are one session; multi-threaded backups have one per thread group.
+    """
+    chunks: list
+    decoded: bytearray = field(default_factory=bytearray)
+    next_chunk: int = 0
+    decoder: object = None
+
+    @property
+    def uncompressed_offset(self):
+        return self.chunks[0].uncompressed_offset
+
+    @property
+    def uncompressed_end(self):
+        last = self.chunks[-1]
+        return last.uncompressed_offset + last.uncompressed_size
+
+
+class Xpress9Stream:
+    """
+    Lazily decompressed view over an Xpress9 compressed DataModel.
+
+    Only the chunk index is built up front. Slicing decodes just the sessions that
+    overlap the requested range, and each of them only up to the last chunk needed,
+    since Xpress9 blocks cannot be decoded out of order within a session.
+
+    Decoded sessions are kept in memory. A single-threaded backup is one session and its
+    virtual directory is stored near the end of the image, so opening it decodes and keeps
+    the whole image; only multi-threaded backups leave the sessions nobody reads undecoded.
+    """
+
+    def __init__(self, file_path, sessions):
+        self.file_path = file_path
+        self.sessions = [session for session in sessions if session.chunks]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.sessions[-1].uncompressed_end if self.sessions else 0
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self[key:key + 1][0] if key >= 0 else self[len(self) + key]
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError("Xpress9Stream only supports contiguous slices.")
+        return self.read(start, max(0, stop - start))
+
+    @property
+    def decompressed_size(self):
+        """Number of bytes decompressed so far."""
+        return sum(len(session.decoded) for session in self.sessions)
+
+    def read(self, offset, size):
+        """Returns `size` bytes starting at `offset` of the decompressed image."""
+        end = offset + size
+        result = bytearray()
+        with self._lock:
+            self.__decode_range(offset, end)
+            for session in self.sessions:
+                if session.uncompressed_end <= offset or session.uncompressed_offset >= end:
+                    continue
+                lo = max(offset, session.uncompressed_offset) - session.uncompressed_offset
+                hi = min(end, session.uncompressed_end) - session.uncompressed_offset
+                result += session.decoded[lo:hi]
+        return result
+
+    def close(self):
+        """Releases the decoders and everything decompressed so far."""
+        with self._lock:
+            for session in self.sessions:
+                session.decoder = None
+                session.decoded = bytearray()
+                session.next_chunk = 0
+
+    def __decode_range(self, offset, end):
+        pending = []
+        for session in self.sessions:
+            if session.uncompressed_end <= offset or session.uncompressed_offset >= end:
+                continue
+            if session.uncompressed_offset + len(session.decoded) < end:
+                pending.append(session)
+        if not pending:
+            return
+
+        with zipfile.ZipFile(self.file_path, 'r') as zip_ref:
+            with zip_ref.open('DataModel') as data_model_file:
+                for session in pending:
+                    self.__decode_session(data_model_file, session, end)
+
+    def __decode_session(self, data_model_file, session, end):
+        if session.decoder is None:
+            session.decoder = Xpress9()
+        while (session.next_chunk < len(session.chunks)
+               and session.uncompressed_offset + len(session.decoded) < end):
+            chunk = session.chunks[session.next_chunk]
+            data_model_file.seek(chunk.compressed_offset)
+            compressed_data = data_model_file.read(chunk.compressed_size)
+            session.decoded.extend(session.decoder.decompress(compressed_data, chunk.uncompressed_size))
+            session.next_chunk += 1
+        if session.next_chunk == len(session.chunks):
+            # Session fully decoded, the decoder is no longer needed
+            session.decoder = None
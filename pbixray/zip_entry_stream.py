@@ -0,0 +1,51 @@
+import struct
+import threading
+import zipfile
+
+
+class ZipEntryStream:
+    """
+    Read-on-demand view over an uncompressed DataModel inside a PBIX file.
+
+    Slicing reads just the requested range. Entries stored without zip compression are read
+    directly from the PBIX file at their data offset; deflated entries go through zipfile.
+    """
+    LOCAL_HEADER_SIZE = 30
+
+    def __init__(self, file_path, entry_name='DataModel'):
+        self.file_path = file_path
+        self.entry_name = entry_name
+        self._lock = threading.Lock()
+        with zipfile.ZipFile(file_path, 'r') as zip_ref:
+            info = zip_ref.getinfo(entry_name)
+            self._size = info.file_size
+            self._data_offset = None
+            if info.compress_type == zipfile.ZIP_STORED:
+                # The data follows the local file header and its variable-length name and extra fields
+                zip_ref.fp.seek(info.header_offset)
+                header = zip_ref.fp.read(self.LOCAL_HEADER_SIZE)
+                name_length, extra_length = struct.unpack_from('<HH', header, 26)
+                self._data_offset = info.header_offset + self.LOCAL_HEADER_SIZE + name_length + extra_length
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self[key:key + 1][0] if key >= 0 else self[len(self) + key]
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError("ZipEntryStream only supports contiguous slices.")
+        return self.read(start, max(0, stop - start))
+
+    def read(self, offset, size):
+        """Returns `size` bytes starting at `offset` of the entry."""
+        with self._lock:
+            if self._data_offset is not None:
+                with open(self.file_path, 'rb') as f:
+                    f.seek(self._data_offset + offset)
+                    return bytearray(f.read(size))
+            with zipfile.ZipFile(self.file_path, 'r') as zip_ref:
+                with zip_ref.open(self.entry_name) as entry:
+                    entry.seek(offset)
+                    return bytearray(entry.read(size))
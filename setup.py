@@ -8,6 +8,7 @@ setup(
         'xpress9',
         'kaitaistruct',
         'pandas',
+        'numpy>=1.20',
         'apsw'
     ],
     include_package_data=True,
@@ -3,6 +3,9 @@ from pbixray.core import PBIXRay
 import json
 import datetime
 
+# Rows shown in the table data preview
+PREVIEW_ROWS = 1000
+
 def sizeof_fmt(num, suffix="B"):
     for unit in ("", "Ki", "Mi", "Gi", "Ti", "Pi", "Ei", "Zi"):
         if abs(num) < 1024.0:
@@ -113,9 +116,10 @@ def app():
         if st.button("Un-VertiPaq"):
             with st.spinner(f"Loading data from table: {table_name_input}"):
                 try:
-                    table_data = model.get_table(table_name_input)
+                    # Only the first rows are decoded for the preview
+                    table_data = model.get_table(table_name_input, limit=PREVIEW_ROWS)
                     st.dataframe(table_data, use_container_width=True)
-                    st.info(f"Showing {len(table_data)} rows from table '{table_name_input}'")
+                    st.info(f"Showing the first {len(table_data)} rows from table '{table_name_input}'")
                 except Exception as e:
                     st.error(f"Error loading table data: {str(e)}")
 
@@ -1,12 +1,15 @@
 import pytest
 import os
+import pandas as pd
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'pbix')))
 
 from pbixray import PBIXRay
+from pbixray.xpress9_stream import Xpress9Stream
 
 PBIX_FILE_PATH = r"C:\git\hub\pbixray\data\Sales & Returns Sample v201912.pbix"
 # C:\git\hub\pbixray\data\Excalidraw.pbix
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
 
 def test_initialization():
     """Test initialization of the library with the test PBIX file."""
@@ -43,3 +46,177 @@ def test_table_names_method():
     # Verify it returns the same content as tables property but as a list
     tables_array = model.tables
     assert set(table_names) == set(tables_array), "table_names() should contain the same tables as tables property."
+
+def test_metadata_only():
+    """Test that a metadata-only open exposes the same metadata and still reads tables on demand."""
+    for file_name in ["Excalidraw.pbix", "old-Supplier-Quality-Analysis-Sample-PBIX.pbix"]:
+        file_path = os.path.join(DATA_DIR, file_name)
+        model = PBIXRay(file_path)
+        metadata_model = PBIXRay(file_path, metadata_only=True)
+
+        assert metadata_model.table_names() == model.table_names()
+        assert metadata_model.statistics.equals(model.statistics)
+        assert metadata_model.dax_measures.equals(model.dax_measures)
+        assert metadata_model.get_table(model.table_names()[-1]).equals(model.get_table(model.table_names()[-1]))
+
+def test_metadata_only_releases_xpress9_sessions(monkeypatch):
+    """Test what a metadata-only open of a single-threaded Xpress9 backup decodes and keeps."""
+    decoded_when_released = []
+    close = Xpress9Stream.close
+    monkeypatch.setattr(Xpress9Stream, "close", lambda stream: (decoded_when_released.append(stream.decompressed_size), close(stream)))
+
+    file_path = os.path.join(DATA_DIR, "Excalidraw.pbix")
+    metadata_model = PBIXRay(file_path, metadata_only=True)
+    stream = metadata_model._data_model.decompressed_data
+    assert isinstance(stream, Xpress9Stream)
+    # The single session is decoded completely to read the metadata, then released
+    assert decoded_when_released == [len(stream)]
+    assert stream.decompressed_size == 0
+    assert len(metadata_model.table_names()) > 0
+
+    table_name = metadata_model.table_names()[-1]
+    assert metadata_model.get_table(table_name).equals(PBIXRay(file_path).get_table(table_name))
+    assert stream.decompressed_size == len(stream)
+
+def test_categorical_table():
+    """Test that categorical string columns hold the same values as the default object columns."""
+    model = PBIXRay(os.path.join(DATA_DIR, "old-Customer-Profitability-Sample-PBIX.pbix"))
+    table = model.get_table("Industry")
+    categorical_table = model.get_table("Industry", categorical=True)
+
+    string_columns = model.schema[(model.schema["TableName"] == "Industry") & (model.schema["PandasDataType"] == "string")]["ColumnName"]
+    assert len(string_columns) > 0
+    for column in string_columns:
+        assert isinstance(categorical_table[column].dtype, pd.CategoricalDtype)
+        assert categorical_table[column].astype("string").equals(table[column])
+    assert categorical_table.drop(columns=string_columns).equals(table.drop(columns=string_columns))
+
+def test_column_projection():
+    """Test that projected columns match the full table and unknown columns raise."""
+    model = PBIXRay(os.path.join(DATA_DIR, "old-Customer-Profitability-Sample-PBIX.pbix"))
+    table = model.get_table("Customer")
+    projected = model.get_table("Customer", columns=["State", "Customer"])
+    assert projected.columns.tolist() == ["State", "Customer"]
+    assert projected.equals(table[["State", "Customer"]])
+    assert model.get_table("Customer", columns="State").equals(table[["State"]])
+
+    with pytest.raises(ValueError, match="Missing Column"):
+        model.get_table("Customer", columns=["State", "Missing Column"])
+
+def test_iter_table():
+    """Test that the batches of iter_table add up to get_table."""
+    model = PBIXRay(os.path.join(DATA_DIR, "old-Customer-Profitability-Sample-PBIX.pbix"))
+    table = model.get_table("Customer")
+    batches = list(model.iter_table("Customer", batch_size=100))
+    assert [len(batch) for batch in batches] == [100, 100, 100, len(table) - 300]
+    assert pd.concat(batches).equals(table)
+
+    batches = list(model.iter_table("Customer", batch_size=50, columns=["Country/Region"], categorical=True))
+    assert pd.concat(batches).equals(model.get_table("Customer", columns=["Country/Region"], categorical=True))
+
+def test_filtered_table():
+    """Test that filtered tables match masking the full table, including on columns that are not returned."""
+    model = PBIXRay(os.path.join(DATA_DIR, "old-Customer-Profitability-Sample-PBIX.pbix"))
+    table = model.get_table("Customer")
+    states = ["TX", "IL"]
+
+    filtered = model.get_table("Customer", filters=[("State", "in", states), ("Industry ID", ">", 20)])
+    mask = table["State"].isin(states) & (table["Industry ID"] > 20)
+    assert 0 < len(filtered) < len(table)
+    assert filtered.equals(table[mask.fillna(False)])
+
+    projected = model.get_table("Customer", columns=["Name"], filters=[("State", "!=", "TX")], categorical=True)
+    assert projected["Name"].astype("string").equals(table.loc[table["State"] != "TX", "Name"])
+
+    assert model.get_table("Customer", filters=[("State", "==", "Nowhere")]).empty
+
+    with pytest.raises(ValueError, match="Unsupported filter operator"):
+        model.get_table("Customer", filters=[("State", "like", "T%")])
+    with pytest.raises(ValueError, match="Missing Column"):
+        model.get_table("Customer", filters=[("Missing Column", "==", 1)])
+    for value_filter in [("State", "==", None), ("State", "!=", float("nan")), ("State", "in", ["TX", None]), ("State", "in", "TX")]:
+        with pytest.raises(ValueError, match="State"):
+            model.get_table("Customer", filters=[value_filter])
+
+def test_filtered_date_table():
+    """Test filters on a value encoded date column, whose bit pack markers do not convert to dates."""
+    model = PBIXRay(os.path.join(DATA_DIR, "old-Customer-Profitability-Sample-PBIX.pbix"))
+    table = model.get_table("Date")
+    start = pd.Timestamp("2013-01-01")
+
+    filtered = model.get_table("Date", filters=[("Date", ">=", start)])
+    assert 0 < len(filtered) < len(table)
+    assert filtered.equals(table[table["Date"] >= start])
+
+    date = table["Date"].iloc[5]
+    assert model.get_table("Date", filters=[("Date", "==", date)]).equals(table[table["Date"] == date])
+
+def test_aggregate():
+    """Test that aggregates computed over the runs match pandas on the decoded table."""
+    model = PBIXRay(os.path.join(DATA_DIR, "old-Customer-Profitability-Sample-PBIX.pbix"))
+    table = model.get_table("Customer")
+
+    aggregates = model.aggregate("Customer", "Industry ID", ["count", "sum", "mean", "min", "max", "nunique"])
+    expected = table["Industry ID"].agg(["count", "sum", "mean", "min", "max", "nunique"])
+    assert aggregates.index.tolist() == expected.index.tolist()
+    assert aggregates.astype(float).tolist() == pytest.approx(expected.astype(float).tolist())
+
+    grouped = model.aggregate("Customer", "Industry ID", ["count", "sum", "max"], group_by="State")
+    pd.testing.assert_frame_equal(grouped, table.groupby("State")["Industry ID"].agg(["count", "sum", "max"]), check_dtype=False)
+
+    value_counts = model.value_counts("Customer", "State")
+    pd.testing.assert_series_equal(value_counts.sort_index(), table["State"].value_counts().sort_index(),
+                                  check_dtype=False, check_index_type=False)
+
+    with pytest.raises(ValueError, match="Unsupported aggregate operations"):
+        model.aggregate("Customer", "State", ["median"])
+
+def test_aggregate_string_and_date_columns():
+    """Test that count, min, max and nunique work on string and date columns, and sum and mean raise."""
+    model = PBIXRay(os.path.join(DATA_DIR, "old-Customer-Profitability-Sample-PBIX.pbix"))
+    # Read the numbers of Industry ID as days, to group a date column with many values by State
+    schema = model._metadata_handler.metadata.schema_df
+    date_column = schema[(schema["TableName"] == "Customer") & (schema["ColumnName"] == "Industry ID")].assign(ColumnName="Industry Date", DataType=9)
+    model._metadata_handler.metadata.schema_df = pd.concat([schema, date_column], ignore_index=True)
+    table = model.get_table("Customer")
+    assert str(table["Industry Date"].dtype).startswith("datetime64")
+
+    ops = ["count", "min", "max", "nunique"]
+    for column in ["Name", "Industry Date"]:
+        assert model.aggregate("Customer", column, ops).tolist() == table[column].agg(ops).tolist()
+        grouped = model.aggregate("Customer", column, ops, group_by="State")
+        pd.testing.assert_frame_equal(grouped, table.groupby("State")[column].agg(ops), check_dtype=False)
+        with pytest.raises(ValueError, match="numeric column"):
+            model.aggregate("Customer", column, ["count", "sum"])
+
+def test_aggregate_group_by_column_names():
+    """Test group columns named like the columns aggregate computes with, and binary value counts."""
+    model = PBIXRay(os.path.join(DATA_DIR, "old-Customer-Profitability-Sample-PBIX.pbix"))
+    table = model.get_table("Customer")
+    schema = model._metadata_handler.metadata.schema_df
+    ops = ["count", "sum", "mean", "max"]
+    expected = table.groupby("State")["Industry ID"].agg(ops)
+    for name in ["value", "rows", "total"]:
+        state = (schema["TableName"] == "Customer") & (schema["ColumnName"].isin(["State", "value", "rows", "total"]))
+        schema.loc[state, "ColumnName"] = name
+        grouped = model.aggregate("Customer", "Industry ID", ops, group_by=name)
+        pd.testing.assert_frame_equal(grouped, expected.rename_axis(name), check_dtype=False)
+
+    images = model.get_table("Industry")["Image"]
+    value_counts = model.value_counts("Industry", "Image")
+    assert value_counts.sum() == images.notna().sum()
+    pd.testing.assert_series_equal(value_counts.sort_index(), images.value_counts().sort_index(), check_dtype=False)
+
+def test_limit_offset():
+    """Test that row ranges match slicing the full table."""
+    model = PBIXRay(os.path.join(DATA_DIR, "old-Customer-Profitability-Sample-PBIX.pbix"))
+    table = model.get_table("Customer")
+    assert model.get_table("Customer", limit=10).equals(table.iloc[:10])
+    assert model.get_table("Customer", limit=10, offset=300).equals(table.iloc[300:310])
+    assert model.get_table("Customer", offset=len(table) - 3).equals(table.iloc[-3:])
+
+    filtered = model.get_table("Customer", filters=[("State", "==", "TX")])
+    assert model.get_table("Customer", filters=[("State", "==", "TX")], limit=5, offset=2).equals(filtered.iloc[2:7])
+
+    with pytest.raises(ValueError, match="must not be negative"):
+        model.get_table("Customer", limit=-1)
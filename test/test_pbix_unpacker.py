@@ -0,0 +1,215 @@
+import os
+import random
+import time
+import zipfile
+import pytest
+
+from pbixray.cache import DataModelCache
+from pbixray.pbix_unpacker import PbixUnpacker
+from pbixray.xpress9_stream import compress_session
+from pbixray.utils import get_data_slice, get_data_view, open_buffer
+from pbixray.abf.file_log import FileLog
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+SAMPLE_PBIX = os.path.join(DATA_DIR, 'Excalidraw.pbix')
+CHUNK_SIZE = 0x10000
+
+
+def _write_pbix(path, data_model):
+    with zipfile.ZipFile(path, 'w') as zip_ref:
+        zip_ref.writestr('DataModel', bytes(data_model))
+
+
+@pytest.fixture(scope='module')
+def image():
+    return bytes(PbixUnpacker(SAMPLE_PBIX).data_model.decompressed_data)
+
+
+@pytest.fixture(scope='module')
+def single_threaded_pbix(tmp_path_factory, image):
+    """Rewrites the sample as a single-threaded backup with many chunks."""
+    signature = PbixUnpacker.SINGLE_THREAD_SIGNATURE.encode('utf-16le').ljust(102, b'\x00')
+    path = tmp_path_factory.mktemp('pbix') / 'single.pbix'
+    _write_pbix(path, signature + compress_session(image, CHUNK_SIZE))
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def multi_threaded_pbix(tmp_path_factory, image):
+    """Rewrites the sample as a multi-threaded backup with one prefix and two main thread groups."""
+    signature = PbixUnpacker.MULTI_THREAD_SIGNATURE.encode('utf-16le').ljust(102, b'\x00')
+    prefix, main = image[:2 * CHUNK_SIZE], image[2 * CHUNK_SIZE:]
+    main_chunks = -(-len(main) // CHUNK_SIZE)
+    # Pad the main part so that it splits into two equally sized thread groups
+    main_chunks_per_thread = -(-main_chunks // 2)
+    main = main.ljust(2 * main_chunks_per_thread * CHUNK_SIZE, b'\x00')
+    half = main_chunks_per_thread * CHUNK_SIZE
+    header = b''.join(x.to_bytes(8, 'little') for x in (main_chunks_per_thread, 2, 1, 2, CHUNK_SIZE))
+    body = compress_session(prefix, CHUNK_SIZE)
+    body += compress_session(main[:half], CHUNK_SIZE) + compress_session(main[half:], CHUNK_SIZE)
+    path = tmp_path_factory.mktemp('pbix') / 'multi.pbix'
+    _write_pbix(path, signature + header + body)
+    return str(path), len(prefix) + len(main)
+
+
+def test_single_threaded_lazy_matches_eager(single_threaded_pbix, image):
+    eager = PbixUnpacker(single_threaded_pbix).data_model
+    lazy = PbixUnpacker(single_threaded_pbix, lazy=True).data_model
+    assert bytes(eager.decompressed_data) == image
+    assert len(lazy.decompressed_data) == len(image)
+    assert lazy.file_log == eager.file_log
+    for file_ref in lazy.file_log:
+        assert get_data_slice(lazy, file_ref['FileName']) == get_data_slice(eager, file_ref['FileName'])
+
+
+def test_multi_threaded_lazy_matches_eager(multi_threaded_pbix, image):
+    path, size = multi_threaded_pbix
+    eager = PbixUnpacker(path).data_model
+    assert bytes(eager.decompressed_data) == image.ljust(size, b'\x00')
+    lazy = PbixUnpacker(path, lazy=True).data_model
+    assert lazy.file_log == eager.file_log
+    assert lazy.decompressed_data[:] == eager.decompressed_data
+
+
+def test_lazy_single_threaded_decompresses_everything(single_threaded_pbix, image):
+    # The only session is read up to the virtual directory near its end while opening
+    stream = PbixUnpacker(single_threaded_pbix, lazy=True).data_model.decompressed_data
+    assert stream.decompressed_size == len(image)
+
+
+def test_lazy_multi_threaded_decompresses_only_requested_sessions(multi_threaded_pbix, image):
+    path, size = multi_threaded_pbix
+    stream = PbixUnpacker(path, lazy=True).data_model.decompressed_data
+    prefix, first_main, second_main = stream.sessions
+    # Opening reads the header from the prefix session and the directory and backup log from the last session
+    assert len(first_main.decoded) == 0
+    assert stream.decompressed_size == len(prefix.decoded) + len(second_main.decoded) < size
+
+    offset = first_main.uncompressed_offset
+    assert stream[offset:offset + 100] == image[offset:offset + 100]
+    assert len(first_main.decoded) == CHUNK_SIZE
+
+
+@pytest.mark.parametrize('pbix', ['single', 'multi', 'uncompressed'])
+def test_disk_backed_matches_in_memory(pbix, single_threaded_pbix, multi_threaded_pbix, tmp_path):
+    path = {
+        'single': single_threaded_pbix,
+        'multi': multi_threaded_pbix[0],
+        'uncompressed': os.path.join(DATA_DIR, 'old-Supplier-Quality-Analysis-Sample-PBIX.pbix'),
+    }[pbix]
+    in_memory = PbixUnpacker(path).data_model
+    temporary = PbixUnpacker(path, disk_backed=True).data_model
+    storage_path = tmp_path / 'DataModel.abf'
+    stored = PbixUnpacker(path, storage_path=str(storage_path)).data_model
+
+    assert temporary.decompressed_data[:] == in_memory.decompressed_data
+    assert storage_path.read_bytes() == in_memory.decompressed_data
+    assert stored.file_log == in_memory.file_log
+    file_name = in_memory.file_log[-1]['FileName']
+    assert get_data_slice(stored, file_name) == get_data_slice(in_memory, file_name)
+
+
+def test_storage_path_replaces_mapped_image(single_threaded_pbix, tmp_path):
+    storage_path = tmp_path / 'DataModel.abf'
+    first = PbixUnpacker(single_threaded_pbix, storage_path=str(storage_path)).data_model
+    expected = first.decompressed_data[:]
+    # A second opener writes another model to the same path while the first one still maps it
+    other_pbix = os.path.join(DATA_DIR, 'old-Supplier-Quality-Analysis-Sample-PBIX.pbix')
+    second = PbixUnpacker(other_pbix, storage_path=str(storage_path)).data_model
+
+    assert first.decompressed_data[:] == expected
+    assert storage_path.read_bytes() == second.decompressed_data[:] != expected
+    assert [p.name for p in tmp_path.iterdir()] == ['DataModel.abf']
+
+    # Reusing the image maps it without reading the PBIX file
+    reused = PbixUnpacker(str(tmp_path / 'missing.pbix'), storage_path=str(storage_path), reuse_storage=True).data_model
+    assert reused.file_log == second.file_log
+    assert reused.decompressed_data[:] == second.decompressed_data[:]
+
+    with pytest.raises(ValueError):
+        PbixUnpacker(single_threaded_pbix, reuse_storage=True)
+
+
+def test_lazy_cannot_be_disk_backed(single_threaded_pbix):
+    with pytest.raises(ValueError):
+        PbixUnpacker(single_threaded_pbix, lazy=True, disk_backed=True)
+
+
+def test_cache_reuses_decompressed_model(single_threaded_pbix, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    expected = PbixUnpacker(single_threaded_pbix).data_model
+    first = PbixUnpacker(single_threaded_pbix, cache_dir=str(cache_dir)).data_model
+    assert sorted(p.suffix for p in cache_dir.iterdir()) == ['.abf', '.json']
+
+    second = PbixUnpacker(single_threaded_pbix, cache_dir=str(cache_dir)).data_model
+    assert second.file_log == expected.file_log
+    assert (second.error_code, second.apply_compression) == (expected.error_code, expected.apply_compression)
+    assert second.decompressed_data[:] == expected.decompressed_data == first.decompressed_data[:]
+
+
+def test_cache_evicts_least_recently_used(single_threaded_pbix, multi_threaded_pbix, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    PbixUnpacker(single_threaded_pbix, cache_dir=str(cache_dir), cache_max_bytes=1)
+    PbixUnpacker(multi_threaded_pbix[0], cache_dir=str(cache_dir), cache_max_bytes=1)
+    # Only the most recently stored entry is kept
+    assert len(list(cache_dir.glob('*.json'))) == 1
+    assert len(list(cache_dir.glob('*.abf'))) == 1
+
+
+def test_cache_discards_failed_decompression(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    signature = PbixUnpacker.SINGLE_THREAD_SIGNATURE.encode('utf-16le').ljust(102, b'\x00')
+    path = tmp_path / 'corrupt.pbix'
+    # A frame declaring more compressed bytes than there are
+    _write_pbix(path, signature + CHUNK_SIZE.to_bytes(4, 'little') + (1 << 20).to_bytes(4, 'little') + b'\x01' * 64)
+    with pytest.raises(Exception):
+        PbixUnpacker(str(path), cache_dir=str(cache_dir))
+    assert list(cache_dir.iterdir()) == []
+
+
+def test_cache_evicts_stale_temporary_files(tmp_path):
+    cache = DataModelCache(str(tmp_path))
+    stale, fresh = tmp_path / 'stale.tmp', tmp_path / 'fresh.tmp'
+    stale.write_bytes(b'x')
+    fresh.write_bytes(b'x')
+    old = time.time() - DataModelCache.STALE_TEMPORARY_SECONDS - 60
+    os.utime(stale, (old, old))
+    cache.evict()
+    assert [p.name for p in tmp_path.iterdir()] == ['fresh.tmp']
+
+
+def test_file_log_index():
+    file_log = PbixUnpacker(SAMPLE_PBIX).data_model.file_log
+    entries = list(file_log)
+    assert file_log.total_size == sum(entry.Size for entry in entries)
+    for entry in entries:
+        assert file_log.get(entry.FileName) is next(x for x in entries if x['FileName'] == entry.FileName)
+        assert file_log.get_by_storage_path(entry.StoragePath) is entry
+    assert file_log.sizes([entries[0].FileName, 'missing.idf']) == [entries[0].Size, 0]
+    assert FileLog.from_records(file_log.to_records()) == file_log
+
+
+@pytest.mark.parametrize('disk_backed', [False, True])
+def test_data_view_shares_memory(disk_backed):
+    data_model = PbixUnpacker(SAMPLE_PBIX, disk_backed=disk_backed).data_model
+    for file_ref in data_model.file_log:
+        view = get_data_view(data_model, file_ref.FileName)
+        assert view.obj is data_model.decompressed_data
+        assert view == get_data_slice(data_model, file_ref.FileName)
+        with open_buffer(view) as f:
+            assert f.read() == view
+
+
+@pytest.mark.parametrize('file_name', ['Excalidraw.pbix', 'old-Supplier-Quality-Analysis-Sample-PBIX.pbix'])
+def test_ranged_data_slice(file_name):
+    data_model = PbixUnpacker(os.path.join(DATA_DIR, file_name)).data_model
+    rnd = random.Random(0)
+    for file_ref in data_model.file_log:
+        full = get_data_slice(data_model, file_ref.FileName)
+        for _ in range(5):
+            offset = rnd.randrange(len(full) + 2)
+            length = rnd.randrange(len(full) + 2)
+            assert get_data_slice(data_model, file_ref.FileName, offset, length) == full[offset:offset + length]
+            assert get_data_view(data_model, file_ref.FileName, offset=offset) == full[offset:]
+    if data_model.apply_compression:
+        assert len(data_model.chunk_directories) == len(data_model.file_log)
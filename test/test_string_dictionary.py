@@ -0,0 +1,37 @@
+import os
+import numpy as np
+
+from pbixray import PBIXRay
+from pbixray.string_dictionary import StringDictionary, latin1_page, zero_terminated_page
+from pbixray.vertipaq_decoder import VertiPaqDecoder
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+
+
+def test_zero_terminated_page():
+    data, offsets = zero_terminated_page('abc\0\0Zürich\0trailing')
+    assert data == 'abcZürich'.encode('utf-8')
+    assert offsets.tolist() == [0, 3, 3, 10]
+
+
+def test_latin1_page_widens_offsets():
+    data, offsets = latin1_page(bytearray('caféa\xff'.encode('latin-1')), np.array([0, 4, 5, 6]))
+    assert data == 'caféa\xff'.encode('utf-8')
+    assert offsets.tolist() == [0, 5, 6, 8]
+
+
+def test_string_dictionary_lookup():
+    pages = [zero_terminated_page('a\0bb\0'), latin1_page(bytearray(b'\xe9t\xe9'), np.array([0, 3]))]
+    dictionary = StringDictionary.from_pages(pages, min_data_id=2)
+    assert len(dictionary) == 3
+    assert dict(dictionary) == {2: 'a', 3: 'bb', 4: 'été'}
+    assert dictionary.to_list() == ['a', 'bb', 'été']
+    assert np.int64(3) in dictionary and 5 not in dictionary
+
+
+def test_parallel_page_decoding(monkeypatch):
+    pbix = os.path.join(DATA_DIR, 'old-Customer-Profitability-Sample-PBIX.pbix')
+    expected = PBIXRay(pbix).get_table('Industry')
+    # The sample has a single compressed page, let it go through the process pool anyway
+    monkeypatch.setattr(VertiPaqDecoder, 'PARALLEL_MIN_PAGES', 1)
+    assert PBIXRay(pbix, max_workers=2).get_table('Industry').equals(expected)
@@ -0,0 +1,236 @@
+import os
+import numpy as np
+import pytest
+
+from kaitaistruct import KaitaiStream
+
+from pbixray import PBIXRay
+from pbixray.column_data.dictionary import ColumnDataDictionary
+from pbixray.column_data.idf import ColumnDataIdf
+from pbixray.column_data.idf_reader import read_idf
+from pbixray.utils import get_data_view, open_buffer
+from pbixray.vertipaq_decoder import _SegmentRuns
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+
+
+@pytest.fixture(scope='module')
+def model():
+    return PBIXRay(os.path.join(DATA_DIR, 'old-Supplier-Quality-Analysis-Sample-PBIX.pbix'))
+
+
+def test_number_dictionary_matches_kaitai(model):
+    decoder = model._vertipaq_decoder
+    checked = 0
+    for file_ref in model._data_model.file_log:
+        if not file_ref.FileName.endswith('.dictionary'):
+            continue
+        buffer = get_data_view(model._data_model, file_ref.FileName)
+        with open_buffer(buffer) as f:
+            dictionary = ColumnDataDictionary.from_io(f)
+        if dictionary.dictionary_type not in (ColumnDataDictionary.DictionaryTypes.xm_type_long, ColumnDataDictionary.DictionaryTypes.xm_type_real):
+            assert decoder._read_number_dictionary(buffer) is None
+            continue
+        values = decoder._read_number_dictionary(buffer)
+        assert not values.flags.owndata  # a view of the buffer, not a copy
+        np.testing.assert_array_equal(values, dictionary.data.vector_of_vectors_info.values)
+        checked += 1
+    assert checked > 0
+
+
+def reference_bitpacked(sub_segment, bit_width, min_data_id):
+    mask = (1 << bit_width) - 1
+    res = []
+    for u8le in sub_segment:
+        for _ in range(64 // bit_width):
+            res.append(min_data_id + (u8le & mask))
+            u8le >>= bit_width
+    return res
+
+
+@pytest.mark.parametrize('bit_width', list(range(1, 33)) + [64])
+def test_read_bitpacked_matches_loop(model, bit_width):
+    rng = np.random.default_rng(bit_width)
+    sub_segment = [int(word) for word in rng.integers(0, 2**64, size=50, dtype=np.uint64)]
+    values = model._vertipaq_decoder._read_bitpacked(sub_segment, bit_width, 3)
+    assert values.dtype == np.int64
+    assert values.tolist() == [value if value < 2**63 else value - 2**64
+                               for value in reference_bitpacked(sub_segment, bit_width, 3)]
+
+
+def test_expand_rle_bit_packed_hybrid(model):
+    bitpacked_values = np.arange(10, 15, dtype=np.int64)
+    # RLE run, marker for 2 values, RLE run, marker (offset by the 2 values used) running past the end
+    data_values = [7, 0xFFFFFFFF, 8, 0xFFFFFFFF - 2]
+    repeat_values = [3, 2, 1, 5]
+    vector = model._vertipaq_decoder._expand_rle_bit_packed_hybrid(data_values, repeat_values, bitpacked_values)
+    assert vector.tolist() == [7, 7, 7, 10, 11, 8, 12, 13, 14]
+
+
+def column_files(model, table_name, column_name):
+    """Returns the IDF and idfmeta buffers of a column."""
+    schema = model._metadata_handler.metadata.schema_df
+    idf_name = schema[(schema['TableName'] == table_name) & (schema['ColumnName'] == column_name)]['IDF'].iloc[0]
+    return bytes(get_data_view(model._data_model, idf_name)), bytes(get_data_view(model._data_model, idf_name + 'meta'))
+
+
+def two_segment_files(single_idf, single_idfmeta):
+    """Stores the only segment of a column twice: IDF segments follow each other, idfmeta repeats the column segment element."""
+    cs_start = 14  # column partition tag and version
+    cs_end = single_idfmeta.index(b'CP:1>\x00')
+    return single_idf + single_idf, single_idfmeta[:cs_end] + single_idfmeta[cs_start:cs_end] + single_idfmeta[cs_end:]
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_multi_segment_idf(model, monkeypatch, max_workers):
+    decoder = model._vertipaq_decoder
+    single_idf, single_idfmeta = column_files(model, 'Metrics', 'Plant ID')
+    single_meta = decoder._read_idfmeta(single_idfmeta)
+    expected = decoder._read_rle_bit_packed_hybrid(single_idf, single_meta['segments'])
+    assert len(expected) == single_meta['segments'][0]['records']
+
+    idf, idfmeta = two_segment_files(single_idf, single_idfmeta)
+
+    meta = decoder._read_idfmeta(idfmeta)
+    assert meta['segments'] == single_meta['segments'] * 2
+    monkeypatch.setattr(decoder, '_max_workers', max_workers)
+    vector = decoder._read_rle_bit_packed_hybrid(idf, meta['segments'])
+    np.testing.assert_array_equal(vector, np.concatenate([expected, expected]))
+
+    with pytest.raises(ValueError):
+        decoder._read_rle_bit_packed_hybrid(idf, single_meta['segments'])
+
+
+def test_read_row_range(model):
+    decoder = model._vertipaq_decoder
+    idf, idfmeta = two_segment_files(*column_files(model, 'Metrics', 'Plant ID'))
+    segments = decoder._read_idfmeta(idfmeta)['segments']
+    expected = decoder._read_rle_bit_packed_hybrid(idf, segments)
+    records = segments[0]['records']
+    reads = []
+    def read(offset, length):
+        reads.append((offset, length))
+        return idf[offset:offset + length]
+
+    for start, stop in [(0, 10), (records - 5, records + 5), (records, None), (records + 1, records + 1), (0, None), (5, 3 * records)]:
+        reads.clear()
+        np.testing.assert_array_equal(decoder._read_row_range(read, segments, start, stop), expected[start:stop])
+        assert all(offset + length <= len(idf) for offset, length in reads)
+
+    # The first rows don't read the second segment, the last rows only read the sizes of the first one
+    half = len(idf) // 2
+    reads.clear()
+    decoder._read_row_range(read, segments, 0, 10)
+    assert all(offset < half for offset, _ in reads)
+    assert sum(length for _, length in reads) < half
+    reads.clear()
+    decoder._read_row_range(read, segments, 2 * records - 10)
+    assert sum(length for offset, length in reads if offset < half) == 16
+
+
+def test_iter_rle_bit_packed_hybrid_reads_ranges(model):
+    decoder = model._vertipaq_decoder
+    idf, idfmeta = two_segment_files(*column_files(model, 'Metrics', 'Plant ID'))
+    segments = decoder._read_idfmeta(idfmeta)['segments']
+    expected = decoder._read_rle_bit_packed_hybrid(idf, segments)
+    reads = []
+    def read(offset, length):
+        reads.append((offset, length))
+        return idf[offset:offset + length]
+
+    batches = decoder._iter_rle_bit_packed_hybrid(read, segments, 7)
+    first = next(batches)
+    # The first batch doesn't read the second segment
+    assert all(offset < len(idf) // 2 for offset, _ in reads)
+    batches = [first] + list(batches)
+    assert [len(batch) for batch in batches[:-1]] == [7] * (len(batches) - 1)
+    np.testing.assert_array_equal(np.concatenate(batches), expected)
+
+
+def test_read_idf_matches_kaitai(model):
+    checked = 0
+    for file_ref in model._data_model.file_log:
+        if not file_ref.FileName.endswith('.idf'):
+            continue
+        buffer = get_data_view(model._data_model, file_ref.FileName)
+        try:
+            with open_buffer(buffer) as f:
+                expected = ColumnDataIdf(KaitaiStream(f)).segments
+        except EOFError:
+            with pytest.raises(ValueError):
+                read_idf(buffer)
+            continue
+        segments = read_idf(buffer)
+        assert len(segments) == len(expected)
+        for segment, expected_segment in zip(segments, expected):
+            assert not segment.primary_segment.flags.owndata and not segment.sub_segment.flags.owndata
+            assert segment.primary_segment['data_value'].tolist() == [entry.data_value for entry in expected_segment.primary_segment]
+            assert segment.primary_segment['repeat_value'].tolist() == [entry.repeat_value for entry in expected_segment.primary_segment]
+            assert segment.sub_segment.tolist() == expected_segment.sub_segment
+        checked += 1
+    assert checked > 0
+
+
+def test_segment_runs_expand_ranges(model):
+    bitpacked_values = np.arange(10, 15, dtype=np.int64)
+    data_values = [7, 0xFFFFFFFF, 8, 0xFFFFFFFF - 2]
+    repeat_values = [3, 2, 1, 5]
+    expected = model._vertipaq_decoder._expand_rle_bit_packed_hybrid(data_values, repeat_values, bitpacked_values)
+    runs = _SegmentRuns(data_values, repeat_values, len(bitpacked_values))
+    assert runs.row_count == len(expected)
+    for start in range(len(expected)):
+        for end in range(start, len(expected) + 1):
+            vector = runs.expand(start, end, lambda first, last: bitpacked_values[first:last])
+            assert vector.tolist() == expected[start:end].tolist()
+
+
+def test_segment_runs_mask_and_take(model):
+    bitpacked_values = np.arange(10, 15, dtype=np.int64)
+    data_values = [7, 0xFFFFFFFF, 8, 0xFFFFFFFF - 2]
+    repeat_values = [3, 2, 1, 5]
+    expected = model._vertipaq_decoder._expand_rle_bit_packed_hybrid(data_values, repeat_values, bitpacked_values)
+    runs = _SegmentRuns(data_values, repeat_values, len(bitpacked_values))
+    read_bitpacked = lambda first, last: bitpacked_values[first:last]
+
+    mask = runs.mask(lambda values: values % 2 == 0, read_bitpacked)
+    assert mask.tolist() == (expected % 2 == 0).tolist()
+
+    rng = np.random.default_rng(0)
+    for size in range(len(expected) + 1):
+        rows = np.sort(rng.choice(len(expected), size=size, replace=False))
+        assert runs.take(rows, read_bitpacked).tolist() == expected[rows].tolist()
+
+
+def test_segment_runs_intervals(model):
+    bitpacked_values = np.arange(10, 15, dtype=np.int64)
+    data_values = [7, 0xFFFFFFFF, 8, 0xFFFFFFFF - 2, 9]
+    repeat_values = [3, 2, 0, 5, 4]
+    expected = model._vertipaq_decoder._expand_rle_bit_packed_hybrid(data_values, repeat_values, bitpacked_values)
+    runs = _SegmentRuns(data_values, repeat_values, len(bitpacked_values))
+    values, lengths = runs.intervals(lambda first, last: bitpacked_values[first:last])
+    assert values.tolist() == [7, 10, 11, 12, 13, 14, 9]
+    assert np.repeat(values, lengths).tolist() == expected.tolist()
+
+
+def test_segment_runs_find_markers_like_a_loop_over_runs():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        repeat_values = rng.integers(0, 20, size=200)
+        data_values = rng.integers(0, 100, size=200)
+        # Markers, and values just below the marker value of their run that are not markers
+        bit_packed_offset = 0
+        for run in sorted(rng.choice(200, size=20, replace=False)):
+            data_values[run] = 0xFFFFFFFF - bit_packed_offset - rng.integers(0, 2)
+            if data_values[run] + bit_packed_offset == 0xFFFFFFFF:
+                bit_packed_offset += repeat_values[run]
+
+        expected_runs, expected_offsets, offset = [], [], 0
+        for run, data_value in enumerate(data_values.tolist()):
+            if data_value + offset == 0xFFFFFFFF:
+                expected_runs.append(run)
+                expected_offsets.append(offset)
+                offset += int(repeat_values[run])
+
+        runs = _SegmentRuns(data_values, repeat_values, offset)
+        assert runs.marker_runs.tolist() == expected_runs
+        assert runs.marker_offsets.tolist() == expected_offsets
@@ -0,0 +1,83 @@
+import importlib.util
+import os
+import random
+import pytest
+
+from pbixray.pbix_unpacker import PbixUnpacker
+from pbixray.xpress8 import Xpress8
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+SAMPLE_PBIX = os.path.join(DATA_DIR, 'old-Supplier-Quality-Analysis-Sample-PBIX.pbix')
+REFERENCE_PATH = os.path.join(os.path.dirname(__file__), '..', 'utils', 'xpress8_decompress.py')
+
+
+@pytest.fixture(scope='module')
+def reference():
+    """The original byte-at-a-time Xpress8 decoder."""
+    spec = importlib.util.spec_from_file_location('xpress8_decompress', REFERENCE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.decompress
+
+
+@pytest.fixture(scope='module')
+def chunks():
+    data_model = PbixUnpacker(SAMPLE_PBIX).data_model
+    assert data_model.apply_compression
+    chunks = []
+    for file_ref in data_model.file_log:
+        raw = bytes(data_model.decompressed_data[file_ref.m_cbOffsetHeader:file_ref.m_cbOffsetHeader + file_ref.Size])
+        index = 0
+        while index + 4 <= len(raw):
+            uncompressed_size = raw[index] | (raw[index + 1] << 8)
+            compressed_size = raw[index + 2] | (raw[index + 3] << 8)
+            index += 4
+            chunks.append((raw[index:index + compressed_size], uncompressed_size))
+            index += compressed_size
+    return chunks
+
+
+def test_decompress_matches_reference(chunks, reference):
+    for chunk, uncompressed_size in chunks:
+        assert Xpress8.decompress(chunk, uncompressed_size) == reference(chunk, uncompressed_size)
+        assert Xpress8.decompress(memoryview(chunk), uncompressed_size) == reference(chunk, uncompressed_size)
+
+
+def test_decompress_matches_reference_on_damaged_input(chunks, reference):
+    rnd = random.Random(0)
+    for _ in range(500):
+        chunk, uncompressed_size = rnd.choice(chunks)
+        chunk = bytearray(chunk)
+        damage = rnd.randrange(3)
+        if damage == 0:
+            chunk = chunk[:rnd.randrange(len(chunk) + 1)]
+        elif damage == 1:
+            chunk[rnd.randrange(len(chunk))] = rnd.randrange(256)
+        else:
+            uncompressed_size = rnd.randrange(2 * uncompressed_size + 1)
+        assert Xpress8.decompress(bytes(chunk), uncompressed_size) == reference(bytes(chunk), uncompressed_size)
+
+
+def _reference_chunked(input_buffer, reference):
+    """The original serial decompress_chunked loop."""
+    output_buffer = bytearray()
+    index = 0
+    while index + 4 <= len(input_buffer):
+        uncompressed_size = input_buffer[index] | (input_buffer[index + 1] << 8)
+        compressed_size = input_buffer[index + 2] | (input_buffer[index + 3] << 8)
+        index += 4
+        if index + compressed_size > len(input_buffer):
+            break
+        output_buffer.extend(reference(input_buffer[index:index + compressed_size], uncompressed_size))
+        index += compressed_size
+    return output_buffer
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_decompress_chunked_matches_reference(chunks, reference, max_workers):
+    framed = b''.join(uncompressed_size.to_bytes(2, 'little') + len(chunk).to_bytes(2, 'little') + chunk
+                      for chunk, uncompressed_size in chunks[:40])
+    for input_buffer in (framed, framed[:-7], framed + b'\x10\x00\x00\x00'):
+        expected = _reference_chunked(input_buffer, reference)
+        assert Xpress8.decompress_chunked(input_buffer, max_workers=max_workers) == expected
+        assert Xpress8.decompress_chunked(memoryview(input_buffer), max_workers=max_workers) == expected
@@ -0,0 +1,63 @@
+"""
+Micro-benchmark of Huffman string decoding: the bit-by-bit tree walk of
+decode_substring against the table-driven HuffmanDecoder, on every compressed
+string dictionary page of the given PBIX models.
+"""
+import collections
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pbixray.column_data.dictionary import ColumnDataDictionary
+from pbixray.huffman import HuffmanDecoder, build_huffman_tree, decode_substring, decompress_encode_array
+from pbixray.pbix_unpacker import PbixUnpacker
+from pbixray.utils import get_data_view, open_buffer
+
+
+def compressed_pages(file_path):
+    """Yields (file name, string store, [(start_bit, end_bit)]) of every compressed dictionary page."""
+    data_model = PbixUnpacker(file_path).data_model
+    for file_ref in data_model.file_log:
+        if not file_ref.FileName.endswith('.dictionary'):
+            continue
+        try:
+            with open_buffer(get_data_view(data_model, file_ref.FileName)) as f:
+                dictionary = ColumnDataDictionary.from_io(f)
+        except Exception:
+            continue
+        if dictionary.dictionary_type != ColumnDataDictionary.DictionaryTypes.xm_type_string:
+            continue
+        record_handles = collections.defaultdict(list)
+        for handle in dictionary.data.dictionary_record_handles_vector_info.vector_of_record_handle_structures:
+            record_handles[handle.page_id].append(handle.bit_or_byte_offset)
+        for page_id, page in enumerate(dictionary.data.dictionary_pages):
+            if page.page_compressed and record_handles[page_id]:
+                offsets = record_handles[page_id]
+                bounds = list(zip(offsets, offsets[1:] + [page.string_store.store_total_bits]))
+                yield file_ref.FileName, page.string_store, bounds
+
+
+if __name__ == "__main__":
+    files = sys.argv[1:] or sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', 'data', '*.pbix')))
+    for file_path in files:
+        for file_name, store, bounds in compressed_pages(file_path):
+            encode_array = decompress_encode_array(store.encode_array)
+
+            start = time.perf_counter()
+            tree = build_huffman_tree(encode_array)
+            expected = [decode_substring(store.compressed_string_buffer, tree, s, e) for s, e in bounds]
+            tree_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            decoder = HuffmanDecoder(encode_array, store.compressed_string_buffer)
+            strings = [decoder.decode(s, e) for s, e in bounds]
+            table_time = time.perf_counter() - start
+
+            assert strings == expected, f"Decoded strings differ for {file_name}"
+            characters = sum(len(s) for s in strings)
+            print(f"{os.path.basename(file_path)} / {file_name}: {len(strings)} strings, {characters} characters, "
+                  f"tree {characters / tree_time / 1e6:.2f} M chars/s, table {characters / table_time / 1e6:.2f} M chars/s "
+                  f"({tree_time / table_time:.1f}x)")
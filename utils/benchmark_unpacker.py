@@ -0,0 +1,67 @@
+"""
+Reports open time and peak traced memory of PbixUnpacker for a set of PBIX files.
+
+None of the bundled samples is a multi-threaded XPress9 backup, so with
+--rewrite-multithreaded each sample's decompressed image is re-encoded as one
+before measuring, which exercises the multi-threaded decompression path.
+"""
+import glob
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pbixray.pbix_unpacker import PbixUnpacker
+from pbixray.xpress9_stream import compress_session
+
+CHUNK_SIZE = 0x10000
+
+
+def rewrite_multithreaded(file_path, output_path, threads):
+    """Re-encodes the DataModel of a PBIX file as a multi-threaded XPress9 backup."""
+    image = bytes(PbixUnpacker(file_path).data_model.decompressed_data)
+    chunks_per_thread = -(-len(image) // (CHUNK_SIZE * threads))
+    group_size = chunks_per_thread * CHUNK_SIZE
+    image = image.ljust(group_size * threads, b'\x00')
+
+    signature = PbixUnpacker.MULTI_THREAD_SIGNATURE.encode('utf-16le').ljust(102, b'\x00')
+    header = b''.join(x.to_bytes(8, 'little') for x in (chunks_per_thread, 0, 0, threads, CHUNK_SIZE))
+    body = b''.join(compress_session(image[i * group_size:(i + 1) * group_size], CHUNK_SIZE) for i in range(threads))
+    with zipfile.ZipFile(output_path, 'w') as zip_ref:
+        zip_ref.writestr('DataModel', signature + header + body)
+
+
+def measure(file_path, **kwargs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    data_model = PbixUnpacker(file_path, **kwargs).data_model
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(data_model.decompressed_data), peak, elapsed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure PbixUnpacker open time and peak memory')
+    parser.add_argument('files', nargs='*', help='PBIX files (default: data/*.pbix)')
+    parser.add_argument('--rewrite-multithreaded', type=int, metavar='THREADS', default=0,
+                        help='Re-encode each file as a multi-threaded backup with THREADS thread groups')
+    parser.add_argument('--disk-backed', action='store_true', help='Measure with disk backed storage')
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', 'data', '*.pbix')))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for file_path in files:
+            if args.rewrite_multithreaded:
+                rewritten = os.path.join(temp_dir, os.path.basename(file_path))
+                rewrite_multithreaded(file_path, rewritten, args.rewrite_multithreaded)
+                file_path = rewritten
+            size, peak, elapsed = measure(file_path, disk_backed=args.disk_backed)
+            print(f"{os.path.basename(file_path)}: {size} bytes decompressed, "
+                  f"peak {peak} bytes ({peak / size:.2f}x), {elapsed:.3f}s")